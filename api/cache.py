@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import time
+from typing import NamedTuple, Optional
+from datetime import date
+
+from fastapi import Request, Response
+
+from db.postgres import AsyncPostgres
+from metrics import NOT_MODIFIED_RESPONSES
+from models import Repo
+from settings import API_CACHE_MAX_AGE
+
+
+# Ответы API, поддерживающие условные запросы: все чтения /api/, кроме потоковой выгрузки
+CONDITIONAL_PREFIX = "/api/"
+CONDITIONAL_EXCLUDED_PREFIX = "/api/export/"
+
+
+class CacheEntry(NamedTuple):
+    """ Сериализованный ответ для одного снимка топа и версия данных, с которой он прочитан """
+    snapshot_date: Optional[date]
+    version: int
+    body: bytes
+    loaded_at: float
+
+
+class TopReposCache:
+    """ Кэш готового JSON ответа /api/repos/top100 в памяти процесса.
+
+    Запись заменяется целиком (одним присваиванием) при получении уведомления о записи от парсера
+    (PostgreSQL LISTEN) или по истечении ttl, если уведомление было пропущено. """
+
+    def __init__(self, db: AsyncPostgres, ttl: float):
+        """
+        :param db: Подключение к БД.
+        :param ttl: Время жизни записи в секундах.
+        """
+        self.db = db
+        self.ttl = ttl
+        self._entry = None
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    def _is_fresh(self, entry):
+        return entry is not None and time.monotonic() - entry.loaded_at < self.ttl
+
+    async def get(self) -> bytes:
+        """ Возвращает JSON ответа, при необходимости перечитывая топ из БД. """
+        entry = self._entry
+        if self._is_fresh(entry):
+            return entry.body
+
+        # Одновременные запросы с устаревшим кэшем ждут одного обращения к БД
+        async with self._lock:
+            entry = self._entry
+            if self._is_fresh(entry):
+                return entry.body
+            return (await self.refresh()).body
+
+    async def etag(self) -> Optional[str]:
+        """ ETag ответов API: дата последнего снимка топа и версия данных (из кэша, при необходимости
+        перечитываются из БД). None, если снимка еще нет. """
+        await self.get()
+        entry = self._entry
+        if entry.snapshot_date is None:
+            return None
+        return f'"{entry.snapshot_date.isoformat()}.{entry.version}"'
+
+    async def refresh(self) -> CacheEntry:
+        """ Перечитывает топ из БД, сериализует его и атомарно заменяет запись. """
+        # Версия читается до топа: запись между чтениями оставит старую версию, и ее уведомление перечитает кэш
+        version = await self.db.get_data_version()
+        rows = await self.db.get_top_repos()
+        body = json.dumps([Repo(**row).model_dump() for row in rows]).encode()
+        self._entry = CacheEntry(rows[0]['snapshot_date'] if rows else None, version, body, time.monotonic())
+        logging.info(f"Top repos cache refreshed (snapshot {self._entry.snapshot_date}, data version {version})")
+        return self._entry
+
+    def on_snapshot(self, connection, pid, channel, payload):
+        """ Обработчик уведомления о записи парсера (asyncpg listener).
+
+        :param payload: Новая версия данных"""
+        logging.info(f"Data version {payload} notification received")
+        self._refresh_task = asyncio.create_task(self._refresh_on_notify())
+
+    async def _refresh_on_notify(self):
+        try:
+            async with self._lock:
+                await self.refresh()
+        except Exception as e:
+            # Кэш будет обновлен по ttl
+            logging.error(f"Failed to refresh top repos cache: {e}")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """ Проверяет заголовок If-None-Match (слабое сравнение, как требует RFC 9110).
+
+    :param if_none_match: Значение заголовка: список ETag через запятую или *
+    :param etag: ETag текущего ответа"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def conditional_get_middleware(request: Request, call_next):
+    """ Добавляет к успешным ответам API заголовки ETag и Cache-Control и заменяет успешный ответ на 304,
+    если If-None-Match содержит его ETag.
+
+    Данные API меняются только при записи парсера (снимок, активность, замена истории), каждая запись увеличивает
+    версию данных, поэтому ETag - дата последнего снимка и версия данных из кэша топа. ETag общий для всех
+    эндпоинтов, поэтому 304 отдается только после обработки запроса: ответы на неизвестный репозиторий (404)
+    и неверные параметры (400) не заменяются, а метрики учитывают эндпоинт запроса. """
+    path = request.url.path
+    if request.method not in ("GET", "HEAD") or not path.startswith(CONDITIONAL_PREFIX) \
+            or path.startswith(CONDITIONAL_EXCLUDED_PREFIX):
+        return await call_next(request)
+
+    try:
+        etag = await request.app.state.top_repos_cache.etag()
+    except Exception as e:
+        # Без ETag ответ отдается без заголовков кэширования
+        logging.error(f"Failed to get ETag: {e}")
+        return await call_next(request)
+    if etag is None:
+        return await call_next(request)
+
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={API_CACHE_MAX_AGE}"}
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        NOT_MODIFIED_RESPONSES.inc()
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
@@ -1,16 +1,45 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 
 import asyncpg
 
+from metrics import DB_POOL_WAIT, DB_QUERY_LATENCY, DB_QUERIES_COALESCED
+
+
+# Таблицы недельных и месячных сводок активности
+ACTIVITY_ROLLUP_TABLES = {
+    'week': 'repo_activity_weekly',
+    'month': 'repo_activity_monthly',
+}
+
+
+# Кол-во строк, читаемых из курсора выгрузки за одно обращение к БД
+EXPORT_PREFETCH_ROWS = 1000
+
+
 class AsyncPostgres:
     """ Класс для работы с PostgreSQL базой данных. """
-    def __init__(self, db_host: str, db_port: int | str, db_name: str, db_user: str, db_pass: str):
+    def __init__(self, db_host: str, db_port: int | str, db_name: str, db_user: str, db_pass: str,
+                 min_size: int = 2, max_size: int = 10, acquire_timeout: float = None):
+        """
+        :param min_size: Кол-во соединений, открываемых пулом сразу
+        :param max_size: Максимальное кол-во соединений пула
+        :param acquire_timeout: Максимальное время ожидания свободного соединения в секундах (None - без ограничения)
+        """
         self.db_host = db_host
         self.db_port = db_port
         self.db_name = db_name
         self.db_user = db_user
         self.db_pass = db_pass
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
         self.pool = None
+        self.listener = None
+        # Выполняющиеся запросы на чтение: (метод, запрос, параметры) -> задача
+        self._in_flight = {}
 
     async def connect(self):
         """ Открывает соединение с БД. """
@@ -20,98 +49,116 @@ class AsyncPostgres:
                 port=self.db_port,
                 database=self.db_name,
                 user=self.db_user,
-                password=self.db_pass
+                password=self.db_pass,
+                min_size=self.min_size,
+                max_size=self.max_size
             )
-            logging.info("Connected to PostgreSQL")
+            logging.info(f"Connected to PostgreSQL (pool size {self.min_size}..{self.max_size})")
         except asyncpg.PostgresError as e:
             logging.error(f"Failed to connect to PostgreSQL: {e}")
             raise
 
+    @asynccontextmanager
+    async def acquire(self):
+        """ Берет соединение из пула, замеряя время ожидания свободного соединения.
+        Если свободного соединения нет дольше acquire_timeout, выбрасывает asyncio.TimeoutError. """
+        started = time.perf_counter()
+        async with self.pool.acquire(timeout=self.acquire_timeout) as conn:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+            yield conn
+
     async def execute(self, query: str, *params):
         """ Выполняет SQL запросы. """
         try:
-            async with self.pool.acquire() as conn:
-                async with conn.transaction():
-                    return await conn.fetch(query, *params)
+            async with self.acquire() as conn:
+                with DB_QUERY_LATENCY.labels("execute").time():
+                    async with conn.transaction():
+                        return await conn.fetch(query, *params)
         except asyncpg.PostgresError as e:
             logging.error(f"Database query failed: {e}")
             raise
 
-    async def create_tables(self):
-        """ Создает (если нет) таблицы и триггер функцию. """
-        # Запрос для создания таблицы top_repos для хранения данных репозиториев.
-        create_top_repos_table = """
-            CREATE TABLE IF NOT EXISTS top_repos (
-                id SERIAL PRIMARY KEY,
-                repo TEXT NOT NULL,
-                owner TEXT NOT NULL,
-                position_cur INTEGER,
-                position_prev INTEGER,
-                stars INTEGER NOT NULL,
-                watchers INTEGER NOT NULL,
-                forks INTEGER NOT NULL,
-                open_issues INTEGER NOT NULL,
-                language TEXT,
-                snapshot_date DATE NOT NULL
-            );
-        """
+    async def fetchrow(self, query: str, *params):
+        """ Выполняет запрос на чтение и возвращает первую строку.
 
-        # Запрос для создания таблицы repo_activity для хранения данных активности репозитория.
-        create_repo_activity_table = """
-            CREATE TABLE IF NOT EXISTS repo_activity (
-                id SERIAL PRIMARY KEY,
-                repo_id INTEGER REFERENCES top_repos(id) NOT NULL,
-                date DATE NOT NULL,
-                commits INTEGER NOT NULL,
-                authors TEXT[] NOT NULL
-            );
-        """
+        Запрос выполняется без явной транзакции на любом свободном соединении пула. asyncpg кэширует
+        подготовленный (prepared) запрос на каждом соединении, поэтому повторные вызовы не разбирают его заново.
+        Одновременные одинаковые запросы выполняются один раз (см. _coalesce)."""
+        return await self._coalesce("fetchrow", query, params)
 
-        # Запрос для объявления триггер функции, которая присваивает полю position_prev (предыдущая позиция в топе)
-        # старое значение position_cur
-        create_top_repos_function = """
-            CREATE OR REPLACE FUNCTION update_position_prev() RETURNS TRIGGER AS $$
-            BEGIN
-                IF NEW.position_cur IS DISTINCT FROM OLD.position_cur THEN
-                    NEW.position_prev := OLD.position_cur;
-                END IF;
-                RETURN NEW;
-            END;
-            $$ LANGUAGE plpgsql;
-        """
+    async def fetch(self, query: str, *params):
+        """ Выполняет запрос на чтение и возвращает все строки (без явной транзакции, см. fetchrow). """
+        return await self._coalesce("fetch", query, params)
 
-        # Запрос для создания триггера на основе функции update_position_prev и запускает ее
-        # при обновленни значения position_cur (текущей позииции в топе)
-        create_top_repos_trigger = """
-            CREATE TRIGGER update_position_prev_trigger
-            BEFORE UPDATE ON top_repos FOR EACH ROW
-            WHEN (OLD.position_cur IS NOT NULL)
-            EXECUTE PROCEDURE update_position_prev();
-        """
+    async def _coalesce(self, method: str, query: str, params: tuple):
+        """ Объединяет одновременные одинаковые запросы на чтение: пока запрос выполняется, такие же запросы
+        (метод, текст и параметры совпадают) ждут его результата, а не занимают свои соединения пула.
+        Результат не сохраняется после выполнения запроса.
+
+        :param method: Метод соединения asyncpg (fetch или fetchrow)
+        :param query: Текст запроса
+        :param params: Параметры запроса (списки сравниваются по содержимому)"""
+        key = (method, query, tuple(tuple(param) if isinstance(param, list) else param for param in params))
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._read(method, query, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            DB_QUERIES_COALESCED.labels(method).inc()
+        # Отмена одного из ожидающих (клиент отключился) не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Ошибка считается полученной, даже если все ожидавшие запрос были отменены
+        if not task.cancelled():
+            task.exception()
 
+    async def _read(self, method: str, query: str, params: tuple):
         try:
-            # Выполняет объявленные запросы к БД
-            await self.execute(create_top_repos_table)
-            await self.execute(create_repo_activity_table)
-            await self.execute(create_top_repos_function)
-            await self.execute(create_top_repos_trigger)
+            async with self.acquire() as conn:
+                with DB_QUERY_LATENCY.labels(method).time():
+                    return await getattr(conn, method)(query, *params)
         except asyncpg.PostgresError as e:
-            logging.error("Failed to create tables: {e}")
+            logging.error(f"Database query failed: {e}")
             raise
 
+    async def listen(self, channel: str, callback):
+        """ Подписывается на уведомления канала PostgreSQL (LISTEN) через отдельное соединение вне пула.
+
+        :param channel: Название канала.
+        :param callback: Обработчик уведомления (connection, pid, channel, payload)."""
+        try:
+            if self.listener is None:
+                self.listener = await asyncpg.connect(
+                    host=self.db_host,
+                    port=self.db_port,
+                    database=self.db_name,
+                    user=self.db_user,
+                    password=self.db_pass
+                )
+            await self.listener.add_listener(channel, callback)
+            logging.info(f"Listening to PostgreSQL channel {channel}")
+        except asyncpg.PostgresError as e:
+            logging.error(f"Failed to listen to channel {channel}: {e}")
+            raise
 
     async def close(self):
         """ Закрывает соединение с БД. """
-        self.pool.close()
+        if self.listener is not None:
+            await self.listener.close()
+        await self.pool.close()
         logging.info(f"Closing connection to PostgreSQL database")
 
     async def get_top_repos(self):
-        """ Запрашивает и возвращает топ-100 репозиториев. """
+        """ Запрашивает и возвращает топ-100 репозиториев (парсер может отслеживать больше, см. TOP_REPOS_COUNT). """
         try:
             result = await self.execute(
                 """ 
                     SELECT * FROM top_repos
-                    WHERE snapshot_date = CURRENT_DATE - 1
+                    WHERE snapshot_date = CURRENT_DATE - 1 AND position_cur <= 100
                     ORDER BY position_cur
                 """
             )
@@ -122,37 +169,244 @@ class AsyncPostgres:
             logging.error("Failed to get top_repos: {e}")
             raise
 
+    async def get_data_version(self):
+        """ Запрашивает версию данных: парсер увеличивает ее при каждой записи (снимок, активность, замена истории). """
+        try:
+            row = await self.fetchrow("SELECT version FROM data_version")
+            return row['version'] if row else 0
+        except asyncpg.PostgresError as e:
+            logging.error(f"Failed to get data_version: {e}")
+            raise
+
+    async def get_top_repos_at(self, snapshot_date):
+        """ Запрашивает и возвращает топ-100 репозиториев из последнего снимка на указанную дату.
+
+        position_prev - позиция репозитория в предыдущем снимке.
+
+        :param snapshot_date: Дата, на которую запрашивается топ."""
+        try:
+            return await self.fetch(
+                """
+                SELECT r.repo, r.owner, h.position AS position_cur,
+                       (
+                           SELECT p.position FROM top_repos_history p
+                           WHERE p.repo_id = h.repo_id AND p.snapshot_date < h.snapshot_date
+                           ORDER BY p.snapshot_date DESC
+                           LIMIT 1
+                       ) AS position_prev,
+                       h.stars, h.watchers, h.forks, h.open_issues, h.language, h.snapshot_date
+                FROM top_repos_history h
+                JOIN top_repos r ON r.id = h.repo_id
+                WHERE h.snapshot_date = (
+                    SELECT MAX(snapshot_date) FROM top_repos_history WHERE snapshot_date <= $1
+                ) AND h.position <= 100
+                ORDER BY h.position
+                """, snapshot_date
+            )
+        except asyncpg.PostgresError as e:
+            logging.error(f"Failed to get top_repos at {snapshot_date}: {e}")
+            raise
+
+    async def get_repo_history(self, repo, since_date, until_date):
+        """ Запрашивает и возвращает позиции в топе и количество звезд репозитория за указанный период.
+
+        :param repo: Полное название репозитория.
+        :param since_date: Дата начала периода.
+        :param until_date: Дата окончания периода.
+        :return: Список снимков или None, если репозитория нет в БД."""
+        try:
+            rows = await self.fetch(
+                """
+                SELECT h.snapshot_date AS date, h.position, h.stars
+                FROM top_repos r
+                LEFT JOIN top_repos_history h
+                    ON h.repo_id = r.id AND h.snapshot_date BETWEEN $2 AND $3
+                WHERE r.repo = $1
+                ORDER BY h.snapshot_date
+                """, repo, since_date, until_date
+            )
+            if not rows:
+                return None
+            return [row for row in rows if row["date"] is not None]
+        except asyncpg.PostgresError as e:
+            logging.error(f"Failed to get history of {repo}: {e}")
+            raise
+
     async def get_repo_activity(self, repo, since_date, until_date):
-        """ Запрашивает и возвращает активность репозитория за указанный период.
+        """ Запрашивает и возвращает активность репозитория за указанный период одним запросом.
+
+        Активность собирается в JSON массив на стороне БД, поэтому результат можно отдать клиенту как есть.
 
         :param repo: Полное название репозитория.
         :param since_date: Дата начала периода.
-        :param until_date: Дата окончания периода."""
+        :param until_date: Дата окончания периода.
+        :return: JSON массив активности (строка) или None, если репозитория нет в БД."""
+        try:
+            row = await self.fetchrow(
+                """
+                SELECT COALESCE(
+                    (
+                        SELECT json_agg(json_build_object('date', a.date, 'commits', a.commits, 'authors',
+                                                          author_names(a.author_ids))
+                                        ORDER BY a.date)
+                        FROM repo_activity a
+                        WHERE a.repo_id = r.id AND a.date BETWEEN $2 AND $3
+                    ),
+                    '[]'
+                )::text AS activity
+                FROM top_repos r
+                WHERE r.repo = $1
+                """, repo, since_date, until_date
+            )
+            return row["activity"] if row else None
+        except Exception as e:
+            logging.error(f"Failed to get repo_activity from DB: {e}")
+            raise
+
+    async def get_repos_activity(self, repos, since_date, until_date):
+        """ Запрашивает активность нескольких репозиториев за указанный период одним запросом.
 
-        # Проверяет наличие репозитория в БД. Если нет возвращает None
+        :param repos: Список полных названий репозиториев.
+        :param since_date: Дата начала периода.
+        :param until_date: Дата окончания периода.
+        :return: Словарь {repo: JSON массив активности (строка)}, репозиториев нет в БД - нет в словаре."""
         try:
-            repo_data = await self.execute(
-                "SELECT id FROM top_repos WHERE repo = $1", repo
+            rows = await self.fetch(
+                """
+                SELECT r.repo, COALESCE(
+                    (
+                        SELECT json_agg(json_build_object('date', a.date, 'commits', a.commits, 'authors',
+                                                          author_names(a.author_ids))
+                                        ORDER BY a.date)
+                        FROM repo_activity a
+                        WHERE a.repo_id = r.id AND a.date BETWEEN $2 AND $3
+                    ),
+                    '[]'
+                )::text AS activity
+                FROM top_repos r
+                WHERE r.repo = ANY($1::text[])
+                """, repos, since_date, until_date
             )
+            return {row["repo"]: row["activity"] for row in rows}
+        except Exception as e:
+            logging.error(f"Failed to get repo_activity of {len(repos)} repos from DB: {e}")
+            raise
 
-            if not repo_data:
-                return None
+    async def get_repo_contributors(self, repo, since_date, until_date, top):
+        """ Запрашивает и возвращает кол-во уникальных авторов репозитория за период и самых активных из них.
 
-            repo_id = repo_data[0]["id"]
+        Активность автора - кол-во дней периода, в которые у него были коммиты (кол-во коммитов по авторам
+        не хранится). Подсчет идет по id авторов в строках repo_activity периода (диапазон первичного ключа),
+        имена подставляются только для top авторов.
 
-            # Запрашивает данные активности за указанный период
-            result = await self.execute(
+        :param repo: Полное название репозитория.
+        :param since_date: Дата начала периода.
+        :param until_date: Дата окончания периода.
+        :param top: Кол-во самых активных авторов в ответе.
+        :return: JSON объект (строка) или None, если репозитория нет в БД."""
+        try:
+            row = await self.fetchrow(
                 """
-                SELECT * FROM repo_activity
-                WHERE repo_id = $1 AND date BETWEEN $2 AND $3
-                ORDER BY date
-                """, repo_id, since_date, until_date
+                WITH repo AS (
+                    SELECT id FROM top_repos WHERE repo = $1
+                ), days AS (
+                    SELECT author_id, COUNT(*) AS active_days
+                    FROM repo
+                    JOIN repo_activity a ON a.repo_id = repo.id AND a.date BETWEEN $2 AND $3,
+                         unnest(a.author_ids) AS author_id
+                    GROUP BY author_id
+                )
+                SELECT json_build_object(
+                    'unique_contributors', (SELECT COUNT(*) FROM days),
+                    'top_authors', COALESCE(
+                        (
+                            SELECT json_agg(json_build_object('name', au.name, 'active_days', t.active_days)
+                                            ORDER BY t.active_days DESC, t.author_id)
+                            FROM (
+                                SELECT author_id, active_days FROM days
+                                ORDER BY active_days DESC, author_id
+                                LIMIT $4
+                            ) t
+                            JOIN authors au ON au.id = t.author_id
+                        ),
+                        '[]'
+                    )
+                )::text AS contributors
+                FROM repo
+                """, repo, since_date, until_date, top
             )
+            return row["contributors"] if row else None
+        except Exception as e:
+            logging.error(f"Failed to get contributors of {repo} from DB: {e}")
+            raise
 
-            # if not result:
-            #     return []
+    async def get_repo_activity_rollup(self, repo, since_date, until_date, granularity):
+        """ Запрашивает и возвращает недельные или месячные сводки активности репозитория за указанный период.
 
-            return result
+        Возвращаются периоды, начало которых попадает в [начало периода since_date, until_date]; значения
+        сводки относятся ко всему периоду.
+
+        :param repo: Полное название репозитория.
+        :param since_date: Дата начала периода.
+        :param until_date: Дата окончания периода.
+        :param granularity: 'week' или 'month'.
+        :return: JSON массив сводок (строка) или None, если репозитория нет в БД."""
+        table = ACTIVITY_ROLLUP_TABLES[granularity]
+        try:
+            row = await self.fetchrow(
+                f"""
+                SELECT COALESCE(
+                    (
+                        SELECT json_agg(json_build_object('date', a.period_start, 'commits', a.commits,
+                                                          'authors_count', a.authors_count)
+                                        ORDER BY a.period_start)
+                        FROM {table} a
+                        WHERE a.repo_id = r.id
+                          AND a.period_start BETWEEN date_trunc('{granularity}', $2::date)::date AND $3
+                    ),
+                    '[]'
+                )::text AS activity
+                FROM top_repos r
+                WHERE r.repo = $1
+                """, repo, since_date, until_date
+            )
+            return row["activity"] if row else None
         except Exception as e:
-            logging.error(f"Failed to get repo_activity from DB: {e}")
-            raise
\ No newline at end of file
+            logging.error(f"Failed to get {table} from DB: {e}")
+            raise
+
+    async def iter_activity(self, since_date, until_date, repos=None, language=None, after=None,
+                            prefetch=EXPORT_PREFETCH_ROWS):
+        """ Построчно возвращает активность репозиториев за период через курсор на стороне сервера.
+
+        Строки упорядочены по (repo, date), из БД читается не больше prefetch строк за раз, поэтому память
+        не зависит от объема выгрузки. Соединение занято до окончания (или прерывания) итерации.
+
+        :param since_date: Дата начала периода.
+        :param until_date: Дата окончания периода.
+        :param repos: Список полных названий репозиториев (None - все).
+        :param language: Язык программирования репозиториев (None - любой).
+        :param after: (repo, date) последней полученной строки - выгрузка продолжается после нее.
+        :param prefetch: Кол-во строк, читаемых из курсора за раз."""
+        after_repo, after_date = after if after else (None, None)
+        try:
+            async with self.acquire() as conn:
+                # Курсоры PostgreSQL существуют только внутри транзакции
+                async with conn.transaction(readonly=True):
+                    cursor = conn.cursor(
+                        """
+                        SELECT r.repo, a.date, a.commits, author_names(a.author_ids) AS authors
+                        FROM top_repos r
+                        JOIN repo_activity a ON a.repo_id = r.id
+                        WHERE a.date BETWEEN $1 AND $2
+                          AND ($3::text[] IS NULL OR r.repo = ANY($3::text[]))
+                          AND ($4::text IS NULL OR r.language = $4)
+                          AND ($5::text IS NULL OR (r.repo, a.date) > ($5, $6::date))
+                        ORDER BY r.repo, a.date
+                        """, since_date, until_date, repos, language, after_repo, after_date, prefetch=prefetch
+                    )
+                    async for row in cursor:
+                        yield row
+        except asyncpg.PostgresError as e:
+            logging.error(f"Failed to export repo_activity: {e}")
+            raise
@@ -1,11 +1,16 @@
+import csv
+import io
+import json
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import List
+from typing import List, Union
 
-from db.postgres import AsyncPostgres
-from models import Repo, Activity
+from cache import TopReposCache
+from db.postgres import AsyncPostgres, ACTIVITY_ROLLUP_TABLES
+from models import Repo, Activity, ActivityRollup, Contributors, RankHistory, ReposActivity
 
 router = APIRouter()
 
@@ -14,39 +19,194 @@ def get_db(request: Request):
     return request.app.state.db
 
 
-@router.get("/repos/top100", response_model=List[Repo])
-async def get_top100_repos(db: AsyncPostgres = Depends(get_db)):
-    try:
-        top_repos_data = await db.get_top_repos()
-        top_repos = [Repo(**repo_data) for repo_data in top_repos_data]
-        return top_repos
-    except Exception as e:
-        logging.error(f"Error getting top100: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
+def get_top_repos_cache(request: Request):
+    return request.app.state.top_repos_cache
 
 
-@router.get("/{owner}/{repo}/activity", response_model=List[Activity])      # /{owner}/{repo_name}/activity?since={date1}&until={date2}
-async def get_repo_activity(owner: str, repo: str, since: str = None, until: str = None, db: AsyncPostgres = Depends(get_db)):
+def parse_period(since: str, until: str):
+    """ Проверяет и приводит параметры since и until к объектам date. """
     # Проверяет что параметры since и until не пусты
     if not since or not until:
         raise HTTPException(status_code=400, detail="Invalid parameters. Please provide since and until.")
 
     # Приводит since и until к объекту date
     try:
-        since_date = datetime.strptime(since, "%Y-%m-%d").date()
-        until_date = datetime.strptime(until, "%Y-%m-%d").date()
+        return datetime.strptime(since, "%Y-%m-%d").date(), datetime.strptime(until, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
+
+# Кол-во строк выгрузки, отправляемых клиенту одним блоком
+EXPORT_CHUNK_ROWS = 500
+# Максимальное кол-во репозиториев в одном запросе /repos/activity
+BATCH_MAX_REPOS = 100
+# Максимальное кол-во авторов в ответе /{owner}/{repo}/contributors
+CONTRIBUTORS_MAX_TOP = 100
+
+
+@router.get("/repos/top100", response_model=List[Repo])      # /repos/top100?date={date}
+async def get_top100_repos(date: str = None, cache: TopReposCache = Depends(get_top_repos_cache),
+                           db: AsyncPostgres = Depends(get_db)):
+    snapshot_date = None
+    if date:
+        try:
+            snapshot_date = datetime.strptime(date, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+
+    try:
+        if snapshot_date is None:
+            # Отдает готовый JSON из кэша, без обращения к БД и повторной валидации
+            return Response(content=await cache.get(), media_type="application/json")
+
+        # Топ на дату - из истории снимков
+        top_repos_data = await db.get_top_repos_at(snapshot_date)
+        return [Repo(**repo_data) for repo_data in top_repos_data]
+    except Exception as e:
+        logging.error(f"Error getting top100: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/repos/activity", response_model=ReposActivity)     # /repos/activity?repo={owner/repo}&repo=...&since={date1}&until={date2}
+async def get_repos_activity(repo: List[str] = Query(None), since: str = None, until: str = None,
+                             db: AsyncPostgres = Depends(get_db)):
+    """ Возвращает активность нескольких репозиториев за период, сгруппированную по репозиториям.
+    Репозитории, которых нет в БД, перечисляются в unknown. """
+    since_date, until_date = parse_period(since, until)
+    repos = list(dict.fromkeys(repo or []))
+    if not repos:
+        raise HTTPException(status_code=400, detail="Invalid parameters. Please provide at least one repo.")
+    if len(repos) > BATCH_MAX_REPOS:
+        raise HTTPException(status_code=400, detail=f"Too many repos. Maximum is {BATCH_MAX_REPOS}.")
+
+    try:
+        activity_json = await db.get_repos_activity(repos, since_date, until_date)
+    except Exception as e:
+        logging.error(f"Error getting activity of {len(repos)} repos: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+    # Ответ собирается из готовых JSON массивов активности каждого репозитория
+    activity = ", ".join(f"{json.dumps(name)}: {data}" for name, data in activity_json.items())
+    unknown = [name for name in repos if name not in activity_json]
+    return Response(content=f'{{"activity": {{{activity}}}, "unknown": {json.dumps(unknown)}}}',
+                    media_type="application/json")
+
+
+@router.get("/{owner}/{repo}/history", response_model=List[RankHistory])     # /{owner}/{repo_name}/history?since={date1}&until={date2}
+async def get_repo_history(owner: str, repo: str, since: str = None, until: str = None,
+                           db: AsyncPostgres = Depends(get_db)):
+    since_date, until_date = parse_period(since, until)
+
+    try:
+        history_data = await db.get_repo_history(f"{owner}/{repo}", since_date, until_date)
+        if history_data is None:
+            raise HTTPException(status_code=404, detail="Repository does not found.")
+
+        return [RankHistory(**data) for data in history_data]
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logging.error(f"Error getting history of {owner}/{repo}: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+
+@router.get("/{owner}/{repo}/activity", response_model=Union[List[Activity], List[ActivityRollup]])      # /{owner}/{repo_name}/activity?since={date1}&until={date2}&granularity={day|week|month}
+async def get_repo_activity(owner: str, repo: str, since: str = None, until: str = None, granularity: str = "day",
+                            db: AsyncPostgres = Depends(get_db)):
+    since_date, until_date = parse_period(since, until)
+    if granularity != "day" and granularity not in ACTIVITY_ROLLUP_TABLES:
+        raise HTTPException(status_code=400, detail="Invalid granularity. Use day, week or month.")
+
     try:
         repo = f"{owner}/{repo}"
-        activity_data = await db.get_repo_activity(repo, since_date, until_date)
-        if activity_data is None:
+        if granularity == "day":
+            activity_json = await db.get_repo_activity(repo, since_date, until_date)
+        else:
+            # Недельные и месячные данные - из предрассчитанных сводок
+            activity_json = await db.get_repo_activity_rollup(repo, since_date, until_date, granularity)
+        if activity_json is None:
+            raise HTTPException(status_code=404, detail="Repository does not found.")
+
+        # JSON собран в БД и уже соответствует модели ответа - отдается без построения моделей
+        return Response(content=activity_json, media_type="application/json")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+
+@router.get("/{owner}/{repo}/contributors", response_model=Contributors)     # /{owner}/{repo_name}/contributors?since={date1}&until={date2}&top={n}
+async def get_repo_contributors(owner: str, repo: str, since: str = None, until: str = None, top: int = 10,
+                                db: AsyncPostgres = Depends(get_db)):
+    """ Возвращает кол-во уникальных авторов репозитория за период и top самых активных (по дням с коммитами). """
+    since_date, until_date = parse_period(since, until)
+    if not 1 <= top <= CONTRIBUTORS_MAX_TOP:
+        raise HTTPException(status_code=400, detail=f"Invalid top. Use 1..{CONTRIBUTORS_MAX_TOP}.")
+
+    try:
+        contributors_json = await db.get_repo_contributors(f"{owner}/{repo}", since_date, until_date, top)
+        if contributors_json is None:
             raise HTTPException(status_code=404, detail="Repository does not found.")
 
-        activity = [Activity(**data) for data in activity_data]
-        return activity
+        return Response(content=contributors_json, media_type="application/json")
     except HTTPException as e:
         raise e
     except Exception as e:
+        logging.error(f"Error getting contributors of {owner}/{repo}: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error.")
+
+
+@router.get("/export/activity")     # /export/activity?since={date1}&until={date2}&format={ndjson|csv}&repo={owner/repo}&language={language}&resume={owner/repo@date}
+async def export_activity(since: str = None, until: str = None, format: str = "ndjson",
+                          repo: List[str] = Query(None), language: str = None, resume: str = None,
+                          db: AsyncPostgres = Depends(get_db)):
+    """ Потоково выгружает активность репозиториев за период в формате NDJSON или CSV.
+
+    Строки упорядочены по (repo, date). Прерванную выгрузку можно продолжить, передав в resume
+    "{repo}@{date}" последней полученной строки. """
+    since_date, until_date = parse_period(since, until)
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use ndjson or csv.")
+
+    after = None
+    if resume:
+        try:
+            resume_repo, resume_date = resume.rsplit("@", 1)
+            after = (resume_repo, datetime.strptime(resume_date, "%Y-%m-%d").date())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid resume token. Use {owner}/{repo}@YYYY-MM-DD.")
+
+    rows = db.iter_activity(since_date, until_date, repos=repo, language=language, after=after)
+    if format == "csv":
+        return StreamingResponse(_export_csv(rows), media_type="text/csv")
+    return StreamingResponse(_export_ndjson(rows), media_type="application/x-ndjson")
+
+
+async def _export_ndjson(rows):
+    """ Сериализует строки выгрузки в NDJSON блоками по EXPORT_CHUNK_ROWS строк. """
+    chunk = []
+    async for row in rows:
+        chunk.append(json.dumps({"repo": row["repo"], "date": row["date"].isoformat(),
+                                 "commits": row["commits"], "authors": row["authors"]}))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+async def _export_csv(rows):
+    """ Сериализует строки выгрузки в CSV (авторы через ";") блоками по EXPORT_CHUNK_ROWS строк. """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["repo", "date", "commits", "authors"])
+    count = 0
+    async for row in rows:
+        writer.writerow([row["repo"], row["date"].isoformat(), row["commits"], ";".join(row["authors"])])
+        count += 1
+        if count >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    yield buffer.getvalue()
@@ -1,24 +1,38 @@
 from fastapi import FastAPI
+from cache import TopReposCache, conditional_get_middleware
 from db.postgres import AsyncPostgres
 from endpoints import router
+from metrics import metrics_endpoint, metrics_middleware
 import logging
 
-from settings import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB
+from settings import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB, \
+    POSTGRES_POOL_MIN_SIZE, POSTGRES_POOL_MAX_SIZE, POSTGRES_POOL_ACQUIRE_TIMEOUT, TOP_REPOS_SNAPSHOT_CHANNEL, \
+    TOP_REPOS_CACHE_TTL
 
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
+# Последний добавленный middleware выполняется первым: метрики учитывают и ответы 304
+app.middleware("http")(conditional_get_middleware)
+app.middleware("http")(metrics_middleware)
 
 
 @app.on_event("startup")
 async def startup_event():
     app.state.db = AsyncPostgres(db_host=POSTGRES_HOST, db_port=POSTGRES_PORT, db_name=POSTGRES_DB,
-                                 db_user=POSTGRES_USER, db_pass=POSTGRES_PASSWORD)
+                                 db_user=POSTGRES_USER, db_pass=POSTGRES_PASSWORD, min_size=POSTGRES_POOL_MIN_SIZE,
+                                 max_size=POSTGRES_POOL_MAX_SIZE, acquire_timeout=POSTGRES_POOL_ACQUIRE_TIMEOUT)
 
+    # Схема БД создается миграциями при деплое (migrations/migrate.py)
     await app.state.db.connect()
     logging.info("Database connected")
-    await app.state.db.create_tables()
-    logging.info("Tables created or connected")
+
+    app.state.top_repos_cache = TopReposCache(app.state.db, ttl=TOP_REPOS_CACHE_TTL)
+    try:
+        await app.state.db.listen(TOP_REPOS_SNAPSHOT_CHANNEL, app.state.top_repos_cache.on_snapshot)
+    except Exception as e:
+        # Без подписки кэш топа обновляется только по TTL
+        logging.warning(f"Top repos cache works without notifications: {e}")
 
 #
 @app.on_event("shutdown")
@@ -26,3 +40,4 @@ async def shutdown_event():
     await app.state.db.close()
 
 app.include_router(router, prefix="/api")
+app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
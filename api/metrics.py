@@ -0,0 +1,44 @@
+import time
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+
+# Длительность обработки запросов к API по шаблону пути эндпоинта
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds", "API request latency", ["method", "route", "status"]
+)
+
+# Время ожидания свободного соединения в пуле asyncpg
+DB_POOL_WAIT = Histogram("api_db_pool_wait_seconds", "Time spent waiting for a pool connection")
+
+# Длительность выполнения запросов к БД по методу AsyncPostgres
+DB_QUERY_LATENCY = Histogram("api_db_query_duration_seconds", "Database query latency", ["method"])
+
+# Запросы к БД, получившие результат уже выполняющегося такого же запроса
+DB_QUERIES_COALESCED = Counter("api_db_queries_coalesced_total", "Queries served by an identical in-flight query",
+                               ["method"])
+
+# Ответы 304 на условные запросы (If-None-Match), отданные вместо успешного ответа без тела
+NOT_MODIFIED_RESPONSES = Counter("api_not_modified_responses_total", "Conditional requests answered with 304")
+
+
+async def metrics_middleware(request: Request, call_next):
+    """ Замеряет длительность обработки запроса. Путь берется из шаблона маршрута (/api/{owner}/{repo}/activity),
+    чтобы кол-во меток не зависело от параметров. """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - started)
+
+
+async def metrics_endpoint():
+    """ Метрики в формате Prometheus """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
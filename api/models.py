@@ -1,7 +1,7 @@
 import datetime
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Repo(BaseModel):
@@ -21,4 +21,36 @@ class Activity(BaseModel):
     """ Модель данных активности """
     date: datetime.date
     commits: int
-    authors: list[str]
\ No newline at end of file
+    authors: list[str]
+
+
+class ReposActivity(BaseModel):
+    """ Модель данных активности нескольких репозиториев """
+    activity: Dict[str, List[Activity]]
+    unknown: List[str]
+
+
+class ActivityRollup(BaseModel):
+    """ Модель данных сводки активности за неделю или месяц """
+    date: datetime.date
+    commits: int
+    authors_count: int
+
+
+class AuthorActivity(BaseModel):
+    """ Модель данных активности автора за период """
+    name: str
+    active_days: int
+
+
+class Contributors(BaseModel):
+    """ Модель данных авторов репозитория за период """
+    unique_contributors: int
+    top_authors: List[AuthorActivity]
+
+
+class RankHistory(BaseModel):
+    """ Модель данных позиции репозитория в снимке топа """
+    date: datetime.date
+    position: int
+    stars: int
@@ -7,3 +7,17 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
+# Размер пула соединений API и время ожидания свободного соединения в секундах: при всплеске запросов
+# ожидающие получают ошибку по истечении времени, а не копятся без ограничения
+POSTGRES_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2))
+POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10))
+POSTGRES_POOL_ACQUIRE_TIMEOUT = float(os.getenv("POSTGRES_POOL_ACQUIRE_TIMEOUT", 5))
+
+# Канал PostgreSQL NOTIFY, в который парсер сообщает о записи нового снимка топа
+TOP_REPOS_SNAPSHOT_CHANNEL = "top_repos_snapshot"
+
+# API
+# Время жизни кэша ответа /api/repos/top100 в секундах (на случай пропущенного уведомления)
+TOP_REPOS_CACHE_TTL = float(os.getenv("TOP_REPOS_CACHE_TTL", 300))
+# Время в секундах, в течение которого клиент может не перепроверять ответ (Cache-Control: max-age)
+API_CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", 60))
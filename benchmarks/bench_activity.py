@@ -0,0 +1,94 @@
+""" Нагрузочное сравнение чтения активности репозитория: прежний путь (два запроса в транзакциях и
+модель Activity на каждую строку) и AsyncPostgres.get_repo_activity (один запрос, JSON из БД).
+
+Запуск (нужна заполненная БД, подключение из переменных POSTGRES_*):
+    python benchmarks/bench_activity.py --requests 5000 --concurrency 20 --days 365
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from db.postgres import AsyncPostgres  # noqa: E402
+from models import Activity  # noqa: E402
+from settings import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB  # noqa: E402
+
+
+async def legacy_get_repo_activity(db, repo, since_date, until_date):
+    """ Прежняя реализация: поиск id и запрос активности, каждый в своей транзакции, затем модели Activity
+    и их сериализация (как при проверке response_model в FastAPI). """
+    repo_data = await db.execute("SELECT id FROM top_repos WHERE repo = $1", repo)
+    if not repo_data:
+        return None
+    result = await db.execute(
+        """
+        SELECT date, commits, author_names(author_ids) AS authors FROM repo_activity
+        WHERE repo_id = $1 AND date BETWEEN $2 AND $3
+        ORDER BY date
+        """, repo_data[0]["id"], since_date, until_date
+    )
+    activity = [Activity(**row) for row in result]
+    return [Activity.model_validate(item.model_dump()).model_dump_json() for item in activity]
+
+
+async def run(name, call, repos, args):
+    """ Выполняет args.requests запросов при args.concurrency одновременных клиентах. """
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(repos[i % len(repos)])
+
+    async def client():
+        while not queue.empty():
+            repo = queue.get_nowait()
+            started = time.perf_counter()
+            await call(repo)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"  {name:<8} {len(latencies) / elapsed:9.0f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+async def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--requests", type=int, default=5000)
+    args.add_argument("--concurrency", type=int, default=20)
+    args.add_argument("--days", type=int, default=365)
+    args = args.parse_args()
+
+    db = AsyncPostgres(db_host=POSTGRES_HOST, db_port=POSTGRES_PORT, db_name=POSTGRES_DB,
+                       db_user=POSTGRES_USER, db_pass=POSTGRES_PASSWORD)
+    await db.connect()
+    try:
+        repos = [row["repo"] for row in await db.execute("SELECT repo FROM top_repos")]
+        if not repos:
+            sys.exit("top_repos is empty, run the parser first")
+        random.Random(0).shuffle(repos)
+        until_date = date.today()
+        since_date = until_date - timedelta(days=args.days)
+
+        print(f"{args.requests} requests, concurrency {args.concurrency}, range {args.days} days")
+        # Прогрев пула и кэша подготовленных запросов
+        for repo in repos[:args.concurrency]:
+            await legacy_get_repo_activity(db, repo, since_date, until_date)
+            await db.get_repo_activity(repo, since_date, until_date)
+
+        await run("legacy", lambda repo: legacy_get_repo_activity(db, repo, since_date, until_date), repos, args)
+        await run("new", lambda repo: db.get_repo_activity(repo, since_date, until_date), repos, args)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+""" Сравнение агрегации коммитов по дням: прежний цикл на dateutil.parser и parser/aggregation.py.
+
+Запуск: python benchmarks/bench_aggregation.py [--commits 100000] [--repos 100]
+Для прежней реализации нужен python-dateutil.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parser"))
+
+from aggregation import aggregate_commits, aggregate_commits_batch  # noqa: E402
+
+
+def make_commits(count, days=365, authors=500, seed=0):
+    """ Синтетические коммиты в формате ответа /repos/{repo}/commits. """
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {'commit': {'author': {
+            'name': f"author-{rnd.randrange(authors)}",
+            'date': (start + timedelta(seconds=rnd.randrange(days * 86400))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }}}
+        for _ in range(count)
+    ]
+
+
+def legacy_aggregate(commits):
+    """ Агрегация в том виде, в котором она была в GithubParser._get_repo_commits. """
+    from dateutil import parser
+
+    commits_by_date = {}
+    for commit in commits:
+        commit_date = parser.parse(commit['commit']['author']['date']).date()
+        if commit_date not in commits_by_date:
+            commits_by_date[commit_date] = {'date': commit_date, 'commits': 0, 'authors': set()}
+        commits_by_date[commit_date]['commits'] += 1
+        commits_by_date[commit_date]['authors'].add(commit["commit"]['author']['name'])
+    return list(commits_by_date.values())
+
+
+def best_of(func, repeat):
+    """ Лучшее время из repeat запусков, сек. """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--commits", type=int, default=100_000)
+    args.add_argument("--repos", type=int, default=100)
+    args.add_argument("--repeat", type=int, default=3)
+    args = args.parse_args()
+
+    commits = make_commits(args.commits)
+    per_repo = args.commits // args.repos
+    commits_by_repo = {f"repo-{i}": commits[i * per_repo:(i + 1) * per_repo] for i in range(args.repos)}
+
+    # Результаты обеих реализаций должны совпадать
+    expected = sorted((a['date'], a['commits'], frozenset(a['authors'])) for a in legacy_aggregate(commits))
+    actual = sorted((a['date'], a['commits'], frozenset(a['authors'])) for a in aggregate_commits(commits))
+    assert expected == actual, "aggregation results differ"
+
+    results = {
+        "legacy (dateutil)": best_of(lambda: legacy_aggregate(commits), args.repeat),
+        "aggregate_commits": best_of(lambda: aggregate_commits(commits), args.repeat),
+        f"aggregate_commits_batch ({args.repos} repos)": best_of(
+            lambda: aggregate_commits_batch(commits_by_repo), args.repeat),
+    }
+    baseline = results["legacy (dateutil)"]
+    print(f"{args.commits} commits, best of {args.repeat}")
+    for name, elapsed in results.items():
+        print(f"  {name:<40} {elapsed * 1000:9.1f} ms  {args.commits / elapsed:12,.0f} commits/s  "
+              f"x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
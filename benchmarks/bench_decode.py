@@ -0,0 +1,136 @@
+""" Сравнение разбора страниц коммитов GitHub: прежний путь (response.json() всего тела и сокращение коммитов
+до нужных полей) и потоковый разбор parser/commits_decoder.py. Измеряются пропускная способность
+и пиковая память (tracemalloc) на страницу.
+
+Запуск: python benchmarks/bench_decode.py [--pages 200] [--per-page 100]
+Декодер на orjson (и разбор всего тела orjson для сравнения) измеряется, если установлен orjson.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "parser"))
+
+from commits_decoder import CHUNK_SIZE, ArrayCommitsDecoder, BatchCommitsDecoder, orjson, project_commit  # noqa: E402
+
+
+def make_user(rnd, login):
+    """ Пользователь GitHub в том виде, в котором он приходит в полях author и committer коммита. """
+    user_id = rnd.randrange(10 ** 8)
+    base = f"https://api.github.com/users/{login}"
+    return {
+        'login': login, 'id': user_id, 'node_id': f"MDQ6VXNlcj{user_id}", 'gravatar_id': "", 'type': "User",
+        'avatar_url': f"https://avatars.githubusercontent.com/u/{user_id}?v=4", 'url': base,
+        'html_url': f"https://github.com/{login}", 'site_admin': False,
+        **{f"{name}_url": f"{base}/{name}" for name in (
+            'followers', 'following', 'gists', 'starred', 'subscriptions', 'organizations', 'repos', 'events',
+            'received_events')},
+    }
+
+
+def make_page(rnd, per_page, start):
+    """ Страница ответа /repos/{repo}/commits со всеми полями, которые возвращает GitHub. """
+    commits = []
+    for i in range(per_page):
+        sha = f"{rnd.getrandbits(160):040x}"
+        login = f"author-{rnd.randrange(500)}"
+        date = (start - timedelta(seconds=i * 3600 + rnd.randrange(3600))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        person = {'name': f"Author {login} Ünïcode", 'email': f"{login}@users.noreply.github.com", 'date': date}
+        url = f"https://api.github.com/repos/owner/repo/commits/{sha}"
+        commits.append({
+            'sha': sha, 'node_id': f"C_kwDO{sha[:24]}", 'url': url,
+            'html_url': f"https://github.com/owner/repo/commit/{sha}", 'comments_url': f"{url}/comments",
+            'commit': {
+                'author': person, 'committer': {**person, 'name': "GitHub"},
+                'message': f"Fix issue #{rnd.randrange(10000)}\n\n" + "Details of the change. " * rnd.randrange(1, 20),
+                'tree': {'sha': f"{rnd.getrandbits(160):040x}", 'url': f"{url}/tree"},
+                'url': url, 'comment_count': 0,
+                'verification': {'verified': True, 'reason': "valid", 'signature': "-----BEGIN PGP SIGNATURE-----\n"
+                                 + "A" * 800 + "\n-----END PGP SIGNATURE-----", 'payload': "tree ...\n" * 8,
+                                 'verified_at': date},
+            },
+            'author': make_user(rnd, login), 'committer': make_user(rnd, "web-flow"),
+            # Каждый пятый коммит - merge с двумя родителями
+            'parents': [{'sha': f"{rnd.getrandbits(160):040x}", 'url': url, 'html_url': url}
+                        for _ in range(2 if rnd.random() < 0.2 else 1)],
+        })
+    return json.dumps(commits, ensure_ascii=False).encode()
+
+
+def chunked(body):
+    return [body[start:start + CHUNK_SIZE] for start in range(0, len(body), CHUNK_SIZE)]
+
+
+def legacy_decode(chunks):
+    """ Прежний путь: тело читается целиком (response.read()), разбирается json.loads и сокращается. """
+    return [project_commit(commit) for commit in json.loads(b''.join(chunks).decode('utf-8'))]
+
+
+def stream_decode(decoder_cls):
+    def decode(chunks):
+        decoder = decoder_cls()
+        for chunk in chunks:
+            decoder.feed(chunk)
+        return decoder.close()
+    return decode
+
+
+def measure(decode, pages, repeat):
+    """ Лучшее время разбора всех страниц и максимальная пиковая память разбора одной страницы. """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for chunks in pages:
+            decode(chunks)
+        timings.append(time.perf_counter() - started)
+
+    peak = 0
+    for chunks in pages[:20]:
+        tracemalloc.start()
+        decode(chunks)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument("--pages", type=int, default=200)
+    args.add_argument("--per-page", type=int, default=100)
+    args.add_argument("--repeat", type=int, default=3)
+    args = args.parse_args()
+
+    rnd = random.Random(0)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    bodies = [make_page(rnd, args.per_page, start - timedelta(days=i)) for i in range(args.pages)]
+    pages = [chunked(body) for body in bodies]
+    total_mb = sum(len(body) for body in bodies) / 2 ** 20
+
+    decoders = {"legacy (response.json)": legacy_decode, "stream (json.raw_decode)": stream_decode(ArrayCommitsDecoder)}
+    if orjson is not None:
+        decoders["orjson.loads (whole body)"] = lambda chunks: [
+            project_commit(commit) for commit in orjson.loads(b''.join(chunks))]
+        decoders["stream (orjson batches)"] = stream_decode(BatchCommitsDecoder)
+
+    # Результаты всех декодеров должны совпадать
+    expected = [legacy_decode(chunks) for chunks in pages[:10]]
+    for name, decode in decoders.items():
+        assert [decode(chunks) for chunks in pages[:10]] == expected, f"{name} results differ"
+
+    print(f"{args.pages} pages x {args.per_page} commits, {total_mb:.1f} MB, "
+          f"{total_mb * 1024 / args.pages:.0f} KB per page, best of {args.repeat}")
+    baseline = None
+    for name, decode in decoders.items():
+        elapsed, peak = measure(decode, pages, args.repeat)
+        baseline = baseline or (elapsed, peak)
+        print(f"  {name:<26} {elapsed * 1000:8.1f} ms  {total_mb / elapsed:7.1f} MB/s  x{baseline[0] / elapsed:.2f}   "
+              f"peak {peak / 1024:8.0f} KB per page  x{baseline[1] / peak:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+""" Локальная замена GitHub API для офлайн запусков парсера и бенчмарков.
+
+Поддерживает:
+    GET  /search/repositories                  - топ репозиториев (параметр per_page)
+    GET  /repos/{owner}/{repo}/commits         - коммиты с since, until, per_page, page, заголовками Link и ETag (304)
+    POST /graphql                              - запросы GraphQLGithubParser (топ и пакетная история коммитов)
+    GET  /_stats                               - счетчики запросов
+
+Задержка ответа, объем коммитов и лимит запросов настраиваются. Лимит считается отдельно для каждого токена
+(заголовок Authorization) и восстанавливается каждые reset_seconds: заголовки X-RateLimit-*, 403 при исчерпании.
+Каждый secondary_limit_every-й запрос получает 403 с Retry-After (вторичный лимит).
+
+Запуск отдельно: python benchmarks/fake_github.py --port 8080 --repos 100 --commits 1000
+и затем парсер с GITHUB_API_URL=http://127.0.0.1:8080
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+
+@dataclass
+class FakeGithubConfig:
+    repos: int = 100                # Кол-во репозиториев в топе
+    commits: int = 1000             # Кол-во коммитов в истории каждого репозитория
+    days: int = 90                  # Период истории коммитов (до вчерашнего дня), дней
+    authors: int = 50               # Кол-во различных авторов в репозитории
+    latency: float = 0.05           # Задержка ответа, сек.
+    jitter: float = 0.0             # Случайная добавка к задержке, сек.
+    rate_limit: int = 5000          # Лимит запросов одного токена (ответы 304 его не расходуют)
+    reset_seconds: int = 3600       # Период восстановления лимита, сек.
+    secondary_limit_every: int = 0  # Каждый N-й запрос - ответ о вторичном лимите (0 - нет)
+    max_per_page: int = 100         # Максимальный размер страницы
+    seed: int = 0
+
+
+class FakeGithub:
+    """ Состояние замены GitHub API: сгенерированные репозитории и коммиты, лимит запросов, счетчики. """
+
+    def __init__(self, config: FakeGithubConfig):
+        self.config = config
+        self.budgets = {}
+        self.requests = {}
+        self._total = 0
+        self._commits = {}
+        self._random = random.Random(config.seed)
+        self.repos = [
+            {
+                'full_name': f"owner{i}/repo{i}",
+                'owner': {'login': f"owner{i}"},
+                # Звезды убывают по степенному закону, в хвосте у нескольких репозиториев одинаковое кол-во
+                'stargazers_count': round(500_000 / (i + 1) ** 0.7),
+                'watchers': round(500_000 / (i + 1) ** 0.7),
+                'forks': 10_000 - i * 10,
+                'open_issues': i,
+                'language': ("Python", "JavaScript", "Go", None)[i % 4],
+            }
+            for i in range(config.repos)
+        ]
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/search/repositories', self.search)
+        app.router.add_get('/repos/{owner}/{repo}/commits', self.commits)
+        app.router.add_post('/graphql', self.graphql)
+        app.router.add_get('/_stats', self.stats)
+        return app
+
+    def commits_of(self, full_name):
+        """ Коммиты репозитория от новых к старым в формате /repos/{repo}/commits (генерируются один раз). """
+        if full_name not in self._commits:
+            rnd = random.Random(f"{self.config.seed}:{full_name}")
+            end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            span = self.config.days * 86400
+            timestamps = sorted((end - timedelta(seconds=rnd.randrange(1, span)) for _ in range(self.config.commits)),
+                                reverse=True)
+            self._commits[full_name] = [
+                {
+                    'sha': hashlib.sha1(f"{full_name}:{n}".encode()).hexdigest(),
+                    'commit': {
+                        'author': {'name': f"author-{rnd.randrange(self.config.authors)}",
+                                   'email': "author@example.com",
+                                   'date': timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")},
+                        'committer': {'name': "GitHub", 'email': "noreply@github.com",
+                                      'date': timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")},
+                        'message': f"Commit {n}",
+                        'tree': {'sha': "0" * 40, 'url': "https://example.com/tree"},
+                        'verification': {'verified': False, 'reason': "unsigned"},
+                    },
+                    'author': {'login': "author", 'id': n, 'url': "https://example.com/user"},
+                    'parents': [{'sha': "0" * 40, 'url': "https://example.com/commit"}],
+                    'url': "https://example.com/commit",
+                }
+                for n, timestamp in enumerate(timestamps)
+            ]
+        return self._commits[full_name]
+
+    @staticmethod
+    def _window(commits, since=None, until=None):
+        """ Коммиты с датой автора в [since, until]. """
+        if since:
+            since = since if 'T' in since else since + "T00:00:00Z"
+            commits = [commit for commit in commits if commit['commit']['author']['date'] >= since]
+        if until:
+            until = until if 'T' in until else until + "T00:00:00Z"
+            commits = [commit for commit in commits if commit['commit']['author']['date'] <= until]
+        return commits
+
+    def budget(self, token):
+        """ [остаток, время восстановления] лимита токена, восстановленный, если период истек. """
+        budget = self.budgets.get(token)
+        now = time.time()
+        if budget is None or budget[1] <= now:
+            budget = self.budgets[token] = [self.config.rate_limit, now + self.config.reset_seconds]
+        return budget
+
+    async def _respond(self, kind, body, request, status=200, headers=None):
+        """ Общая часть ответов: задержка, счетчики, лимит запросов токена и условные запросы по ETag. """
+        await asyncio.sleep(self.config.latency + self._random.random() * self.config.jitter)
+        headers = dict(headers or {})
+        payload = json.dumps(body)
+        etag = '"' + hashlib.md5(payload.encode()).hexdigest() + '"'
+        budget = self.budget(request.headers.get('Authorization'))
+        self._total += 1
+        every = self.config.secondary_limit_every
+        if every and self._total % every == 0:
+            status, payload = 403, json.dumps({'message': "You have exceeded a secondary rate limit"})
+            headers['Retry-After'] = "1"
+        elif request.headers.get('If-None-Match') == etag:
+            status, payload = 304, None
+        elif budget[0] <= 0:
+            status, payload = 403, json.dumps({'message': "API rate limit exceeded"})
+        else:
+            budget[0] -= 1
+
+        self.requests[f"{kind}.{status}"] = self.requests.get(f"{kind}.{status}", 0) + 1
+        headers.update({
+            'ETag': etag,
+            'X-RateLimit-Limit': str(self.config.rate_limit),
+            'X-RateLimit-Remaining': str(max(budget[0], 0)),
+            'X-RateLimit-Reset': str(math.ceil(budget[1])),
+            'X-RateLimit-Resource': "graphql" if kind == 'graphql' else "search" if kind == 'search' else "core",
+        })
+        return web.Response(status=status, text=payload, headers=headers,
+                            content_type='application/json' if payload is not None else None)
+
+    @staticmethod
+    def _stars_filter(query):
+        """ Условие на звезды из запроса поиска: stars:>N, stars:>=N или stars:A..B. """
+        condition = next((term[len('stars:'):] for term in query.split() if term.startswith('stars:')), None)
+        if condition is None:
+            return lambda stars: True
+        if condition.startswith('>='):
+            return lambda stars: stars >= int(condition[2:])
+        if condition.startswith('>'):
+            return lambda stars: stars > int(condition[1:])
+        low, high = condition.split('..')
+        return lambda stars: int(low) <= stars <= int(high)
+
+    async def search(self, request):
+        per_page = min(int(request.query.get('per_page', 30)), self.config.max_per_page)
+        page = int(request.query.get('page', 1))
+        if page * per_page > 1000:
+            # Как и GitHub, отдает только первые 1000 результатов запроса
+            return await self._respond('search', {'message': "Only the first 1000 search results are available"},
+                                       request, status=422)
+        matches = self._stars_filter(request.query.get('q', ""))
+        repos = [repo for repo in self.repos if matches(repo['stargazers_count'])]
+        return await self._respond('search', {'total_count': len(repos),
+                                              'items': repos[(page - 1) * per_page:page * per_page]}, request)
+
+    async def commits(self, request):
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        commits = self.commits_of(full_name)
+        commits = self._window(commits, request.query.get('since'), request.query.get('until'))
+
+        per_page = min(int(request.query.get('per_page', 30)), self.config.max_per_page)
+        page = int(request.query.get('page', 1))
+        last = max(1, -(-len(commits) // per_page))
+        headers = {}
+        if page < last:
+            url = request.url.with_query({**request.query, 'page': page + 1})
+            last_url = request.url.with_query({**request.query, 'page': last})
+            headers['Link'] = f'<{url}>; rel="next", <{last_url}>; rel="last"'
+        return await self._respond('commits', commits[(page - 1) * per_page:page * per_page], request,
+                                   headers=headers)
+
+    async def graphql(self, request):
+        body = await request.json()
+        query, variables = body['query'], body.get('variables') or {}
+        rate_limit = {'cost': 1, 'remaining': self.budget(request.headers.get('Authorization'))[0], 'resetAt': ""}
+
+        if 'search(' in query:
+            nodes = [
+                {
+                    'nameWithOwner': repo['full_name'],
+                    'owner': repo['owner'],
+                    'stargazerCount': repo['stargazers_count'],
+                    'forkCount': repo['forks'],
+                    'issues': {'totalCount': repo['open_issues']},
+                    'pullRequests': {'totalCount': 0},
+                    'primaryLanguage': {'name': repo['language']} if repo['language'] else None,
+                }
+                for repo in self.repos[:variables.get('first', 100)]
+            ]
+            return await self._respond('graphql', {'data': {'search': {'nodes': nodes}, 'rateLimit': rate_limit}},
+                                       request)
+
+        # Пакетный запрос истории: переменные owner{i}, name{i}, since{i}, until{i}, after{i} для псевдонима r{i}
+        data, i = {}, 0
+        while f'owner{i}' in variables:
+            full_name = f"{variables[f'owner{i}']}/{variables[f'name{i}']}"
+            commits = self._window(self.commits_of(full_name), variables.get(f'since{i}'), variables.get(f'until{i}'))
+            offset = int(variables.get(f'after{i}') or 0)
+            page = commits[offset:offset + self.config.max_per_page]
+            data[f'r{i}'] = {'defaultBranchRef': {'target': {'history': {
+                'pageInfo': {'hasNextPage': offset + len(page) < len(commits),
+                             'endCursor': str(offset + len(page))},
+                'nodes': [{'oid': commit['sha'], 'committedDate': commit['commit']['committer']['date'],
+                           'author': {'name': commit['commit']['author']['name'],
+                                      'date': commit['commit']['author']['date']}} for commit in page],
+            }}}}
+            i += 1
+        data['rateLimit'] = rate_limit
+        return await self._respond('graphql', {'data': data}, request)
+
+    async def stats(self, request):
+        remaining = {str(token): self.budget(token)[0] for token in list(self.budgets)}
+        return web.json_response({'requests': self.requests, 'rate_limit_remaining': remaining})
+
+
+async def start(config: FakeGithubConfig, host="127.0.0.1", port=0):
+    """ Запускает замену GitHub API в текущем цикле событий.
+
+    :return: (FakeGithub, web.AppRunner, базовый URL)"""
+    fake = FakeGithub(config)
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return fake, runner, f"http://{host}:{port}"
+
+
+def main():
+    args = argparse.ArgumentParser(description="Fake GitHub API server")
+    args.add_argument("--host", default="127.0.0.1")
+    args.add_argument("--port", type=int, default=8080)
+    for name, default in vars(FakeGithubConfig()).items():
+        args.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    args = args.parse_args()
+
+    config = FakeGithubConfig(**{name: getattr(args, name) for name in vars(FakeGithubConfig())})
+    web.run_app(FakeGithub(config).app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+""" Офлайн сквозной бенчмарк: парсер против локальной замены GitHub API (fake_github.py) во временной БД,
+затем нагрузка на API (/api/repos/top100 и /api/{owner}/{repo}/activity) при фиксированном числе клиентов.
+
+Шаги:
+    1. Создает временную БД bench_<время> и применяет к ней миграции (migrations/migrate.py).
+    2. Запускает замену GitHub API с заданной задержкой, объемом коммитов и лимитом запросов.
+    3. Запускает парсер (python parser/main.py) отдельным процессом и замеряет время запуска, кол-во запросов
+       к GitHub и обращений к БД (транзакции из pg_stat_database, вызовы из pg_stat_statements, если есть).
+    4. Запускает API (uvicorn) и нагружает его, замеряя пропускную способность и p50/p95/p99.
+    5. Сохраняет результаты в JSON (benchmarks/results/ по умолчанию) и удаляет временную БД.
+
+Запуск (нужен доступ к PostgreSQL с правом создания БД, подключение из переменных POSTGRES_*):
+    python benchmarks/run_e2e.py --repos 100 --commits 2000 --latency 0.05 --requests 2000 --concurrency 20
+    python benchmarks/run_e2e.py --backend graphql --keep-db
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import aiohttp
+import asyncpg
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+sys.path.insert(0, str(ROOT / "migrations"))
+
+from fake_github import FakeGithubConfig, start as start_fake_github  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+
+def connect(database):
+    return asyncpg.connect(host=os.getenv("POSTGRES_HOST"), port=os.getenv("POSTGRES_PORT"), database=database,
+                           user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+
+
+def percentiles(latencies):
+    """ p50/p95/p99 и максимум длительностей в миллисекундах. """
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+
+    def at(q):
+        return round(latencies[min(len(latencies) - 1, max(0, int(len(latencies) * q + 0.5) - 1))] * 1000, 3)
+    return {'p50_ms': at(0.5), 'p95_ms': at(0.95), 'p99_ms': at(0.99), 'max_ms': round(latencies[-1] * 1000, 3)}
+
+
+async def db_round_trips(admin, database):
+    """ Счетчики обращений к БД database: завершенные транзакции и вызовы операторов (pg_stat_statements). """
+    await admin.execute("SELECT pg_stat_clear_snapshot()")
+    result = {'xact_commit': await admin.fetchval(
+        "SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = $1", database)}
+    try:
+        result['statements'] = await admin.fetchval(
+            "SELECT coalesce(sum(calls), 0)::bigint FROM pg_stat_statements s "
+            "JOIN pg_database d ON d.oid = s.dbid WHERE d.datname = $1", database)
+    except asyncpg.PostgresError:
+        # pg_stat_statements не установлен
+        pass
+    return result
+
+
+async def wait_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Port {port} is not ready after {timeout}s")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_parser(args, env, admin, database, fake, github_url):
+    """ Запуск парсера отдельным процессом против замены GitHub API. """
+    summary_path = Path(args.output_dir) / f"{database}_run_summary.json"
+    env = {**env, 'GITHUB_API_URL': github_url, 'GITHUB_TOKEN': "",
+           'GITHUB_TOKENS': ",".join(f"bench-{i}" for i in range(args.tokens)), 'GITHUB_BACKEND': args.backend,
+           'TOP_REPOS_COUNT': str(args.top),
+           'RUN_SUMMARY_PATH': str(summary_path)}
+    fake.requests.clear()
+    before = await db_round_trips(admin, database)
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(sys.executable, "main.py", cwd=ROOT / "parser", env=env,
+                                                   stdout=asyncio.subprocess.DEVNULL,
+                                                   stderr=asyncio.subprocess.PIPE)
+    _, stderr = await process.communicate()
+    elapsed = time.perf_counter() - started
+    if process.returncode:
+        sys.stderr.write(stderr.decode())
+        raise RuntimeError(f"Parser exited with code {process.returncode}")
+    # Статистика завершившихся соединений сбрасывается в pg_stat_database с задержкой
+    await asyncio.sleep(1)
+    after = await db_round_trips(admin, database)
+
+    summary = json.loads(summary_path.read_text()) if summary_path.exists() else None
+    summary_path.unlink(missing_ok=True)
+    return {
+        'seconds': round(elapsed, 3),
+        'github_requests': dict(fake.requests),
+        'github_requests_total': sum(fake.requests.values()),
+        'db_round_trips': {name: after[name] - before.get(name, 0) for name in after},
+        'run_summary': summary,
+    }
+
+
+async def load(session, urls, requests, concurrency):
+    """ Выполняет requests запросов к urls (по кругу) при concurrency одновременных клиентах. """
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            async with session.get(urls[i % len(urls)]) as response:
+                await response.read()
+                if response.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {'requests': requests, 'errors': errors, 'seconds': round(elapsed, 3),
+            'rps': round(requests / elapsed, 1), **percentiles(latencies)}
+
+
+async def run_api(args, env, repos):
+    """ Запуск API (uvicorn) и нагрузка на /api/repos/top100 и /api/{owner}/{repo}/activity. """
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=ROOT / "api", env=env)
+    try:
+        await wait_port(port, process)
+        base = f"http://127.0.0.1:{port}/api"
+        until = date.today()
+        since = until - timedelta(days=args.days)
+        targets = {
+            'top100': [f"{base}/repos/top100"],
+            'activity': [f"{base}/{repo}/activity?since={since}&until={until}" for repo in repos],
+        }
+        results = {}
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for name, urls in targets.items():
+                # Прогрев: первые запросы заполняют кэши и пул соединений
+                await load(session, urls, min(len(urls), args.requests), args.concurrency)
+                results[name] = await load(session, urls, args.requests, args.concurrency)
+                print(f"  {name:<9} {results[name]['rps']:9.0f} req/s   p50 {results[name]['p50_ms']:7.2f} ms   "
+                      f"p95 {results[name]['p95_ms']:7.2f} ms   p99 {results[name]['p99_ms']:7.2f} ms")
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def main():
+    args = argparse.ArgumentParser(description="Offline end-to-end parser and API benchmark")
+    args.add_argument("--backend", choices=("rest", "graphql"), default="rest")
+    args.add_argument("--repos", type=int, default=100, help="repos on the fake GitHub")
+    args.add_argument("--commits", type=int, default=1000, help="commits per repo")
+    args.add_argument("--top", type=int, default=100, help="tracked top repos (TOP_REPOS_COUNT)")
+    args.add_argument("--history-days", type=int, default=90, help="commit history span, days")
+    args.add_argument("--latency", type=float, default=0.05, help="fake GitHub response latency, s")
+    args.add_argument("--jitter", type=float, default=0.0, help="random extra latency, s")
+    args.add_argument("--rate-limit", type=int, default=5000, help="fake GitHub request budget per token")
+    args.add_argument("--reset-seconds", type=int, default=3600, help="fake GitHub rate limit window, s")
+    args.add_argument("--secondary-limit-every", type=int, default=0,
+                      help="every N-th fake GitHub response is a secondary rate limit (0 - never)")
+    args.add_argument("--tokens", type=int, default=1, help="GitHub tokens given to the parser")
+    args.add_argument("--parser-runs", type=int, default=2, help="parser runs (later runs are incremental)")
+    args.add_argument("--requests", type=int, default=2000, help="API requests per endpoint")
+    args.add_argument("--concurrency", type=int, default=20, help="concurrent API clients")
+    args.add_argument("--days", type=int, default=30, help="activity period requested from the API, days")
+    args.add_argument("--output-dir", default=str(ROOT / "benchmarks" / "results"))
+    args.add_argument("--keep-db", action="store_true", help="do not drop the throwaway database")
+    args = args.parse_args()
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+
+    database = f"bench_{datetime.now():%Y%m%d_%H%M%S}"
+    admin = await connect(os.getenv("POSTGRES_DB"))
+    await admin.execute(f'CREATE DATABASE "{database}"')
+    print(f"Database {database}")
+    fake_runner = None
+    try:
+        conn = await connect(database)
+        try:
+            await migrate(conn)
+        finally:
+            await conn.close()
+
+        config = FakeGithubConfig(repos=args.repos, commits=args.commits, days=args.history_days,
+                                  latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                                  reset_seconds=args.reset_seconds, secondary_limit_every=args.secondary_limit_every)
+        fake, fake_runner, github_url = await start_fake_github(config)
+        env = {**os.environ, 'POSTGRES_DB': database}
+
+        parser_runs = []
+        for run in range(args.parser_runs):
+            result = await run_parser(args, env, admin, database, fake, github_url)
+            parser_runs.append(result)
+            print(f"  parser run {run + 1}: {result['seconds']:.2f} s, "
+                  f"{result['github_requests_total']} GitHub requests, DB {result['db_round_trips']}")
+
+        results = {
+            'started_at': datetime.now().isoformat(),
+            'args': vars(args),
+            'parser': parser_runs,
+            'api': await run_api(args, env, [repo['full_name'] for repo in fake.repos[:args.top]]),
+        }
+    finally:
+        if fake_runner is not None:
+            await fake_runner.cleanup()
+        if not args.keep_db:
+            await admin.execute(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)')
+        await admin.close()
+
+    path = Path(args.output_dir) / f"{database}.json"
+    path.write_text(json.dumps(results, indent=2))
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
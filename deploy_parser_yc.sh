@@ -1,9 +1,10 @@
 ### Настройка
 # Данные для подключения к PostgreSQL
 POSTGRES_USER="postgres"
-POSRGRES_PASSWORD="postgres"
+POSTGRES_PASSWORD="postgres"
 POSTGRES_HOST="0.0.0.0"
 POSTGRES_PORT="5432"
+POSTGRES_DB="postgres"
 
 # Yandex Cloud
 SERVICE_ACCOUNT_ID="YOUR_SERVICE_ACCOUNT_ID"	# ID сервисного аккаунта
@@ -18,6 +19,10 @@ if [ -z "$REGISTRY_ID" ]; then
         REGISTRY_ID=$(yc container registry create --name "testjson" --format json | jq -r ".id")       
 fi
 
+# Применяет миграции схемы БД (нужен python3 с asyncpg)
+POSTGRES_USER=$POSTGRES_USER POSTGRES_PASSWORD=$POSTGRES_PASSWORD POSTGRES_HOST=$POSTGRES_HOST \
+        POSTGRES_PORT=$POSTGRES_PORT POSTGRES_DB=$POSTGRES_DB python3 migrations/migrate.py || exit 1
+
 # Собирает образ с парсером
 docker build -t parser-image ./parser
 
@@ -41,6 +46,7 @@ yc serverless function version create \
 	--environment POSTGRES_PASSWORD=$POSTGRES_PASSWORD \
 	--environment POSTGRES_HOST=$POSTGRES_HOST \
 	--environment POSTGRES_PORT=$POSTGRES_PORT \
+	--environment POSTGRES_DB=$POSTGRES_DB \
         --source-path ./parser
 
 # Создание триггера функции для запуска раз в день
@@ -0,0 +1,99 @@
+""" Применяет к БД миграции схемы из каталога versions/ (общие для API и парсера).
+
+Запуск при деплое, до старта API и парсера:
+    python migrations/migrate.py            - применить новые миграции
+    python migrations/migrate.py --dry-run  - показать миграции, которые будут применены
+
+Подключение к БД берется из переменных окружения POSTGRES_*.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import asyncpg
+
+logging.basicConfig(level=logging.INFO)
+
+VERSIONS_DIR = Path(__file__).resolve().parent / "versions"
+
+# Ключ advisory lock, исключающий одновременный запуск миграций из нескольких мест
+MIGRATIONS_LOCK_ID = 727_100_001
+
+# Кол-во попыток подключения к БД (при старте вместе с контейнером PostgreSQL БД может быть еще не готова)
+CONNECT_ATTEMPTS = 30
+
+
+def get_migrations():
+    """ Возвращает список (версия, путь) миграций, упорядоченный по версии. """
+    return [(path.stem, path) for path in sorted(VERSIONS_DIR.glob("*.sql"))]
+
+
+async def connect():
+    """ Подключается к БД, повторяя попытки, пока БД не станет доступна. """
+    for attempt in range(1, CONNECT_ATTEMPTS + 1):
+        try:
+            return await asyncpg.connect(
+                host=os.getenv("POSTGRES_HOST"),
+                port=os.getenv("POSTGRES_PORT"),
+                database=os.getenv("POSTGRES_DB"),
+                user=os.getenv("POSTGRES_USER"),
+                password=os.getenv("POSTGRES_PASSWORD")
+            )
+        except (OSError, asyncpg.CannotConnectNowError) as e:
+            if attempt == CONNECT_ATTEMPTS:
+                raise
+            logging.info(f"Waiting for PostgreSQL ({e})")
+            await asyncio.sleep(1)
+
+
+async def migrate(conn, dry_run=False):
+    """ Применяет непримененные миграции, каждую в своей транзакции.
+
+    :param conn: Соединение с БД.
+    :param dry_run: Только вывести список непримененных миграций.
+    :return: Список примененных (или подлежащих применению) версий."""
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_ID)
+    try:
+        await conn.execute(
+            """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """
+        )
+        applied = {row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+        pending = [(version, path) for version, path in get_migrations() if version not in applied]
+
+        for version, path in pending:
+            if dry_run:
+                logging.info(f"Pending migration {version}")
+                continue
+            async with conn.transaction():
+                await conn.execute(path.read_text(encoding="utf-8"))
+                await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", version)
+            logging.info(f"Applied migration {version}")
+
+        if not pending:
+            logging.info("Database schema is up to date")
+        return [version for version, _ in pending]
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_ID)
+
+
+async def main():
+    args = argparse.ArgumentParser(description="Apply database schema migrations")
+    args.add_argument("--dry-run", action="store_true", help="only list pending migrations")
+    args = args.parse_args()
+
+    conn = await connect()
+    try:
+        await migrate(conn, dry_run=args.dry_run)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+-- Исходная схема: таблицы топа и активности, триггер сохранения предыдущей позиции в топе.
+-- Запросы идемпотентны, чтобы миграцию можно было применить к БД, созданной до появления миграций.
+
+-- Таблица top_repos для хранения данных репозиториев
+CREATE TABLE IF NOT EXISTS top_repos (
+    id SERIAL PRIMARY KEY,
+    repo TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    position_cur INTEGER,
+    position_prev INTEGER,
+    stars INTEGER NOT NULL,
+    watchers INTEGER NOT NULL,
+    forks INTEGER NOT NULL,
+    open_issues INTEGER NOT NULL,
+    language TEXT,
+    snapshot_date DATE NOT NULL
+);
+
+-- Таблица repo_activity для хранения данных активности репозитория
+CREATE TABLE IF NOT EXISTS repo_activity (
+    id SERIAL PRIMARY KEY,
+    repo_id INTEGER REFERENCES top_repos(id) NOT NULL,
+    date DATE NOT NULL,
+    commits INTEGER NOT NULL,
+    authors TEXT[] NOT NULL
+);
+
+-- Триггер функция, которая присваивает полю position_prev (предыдущая позиция в топе) старое значение position_cur
+CREATE OR REPLACE FUNCTION update_position_prev() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.position_cur IS DISTINCT FROM OLD.position_cur THEN
+        NEW.position_prev := OLD.position_cur;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_position_prev_trigger ON top_repos;
+CREATE TRIGGER update_position_prev_trigger
+BEFORE UPDATE ON top_repos FOR EACH ROW
+WHEN (OLD.position_cur IS NOT NULL)
+EXECUTE PROCEDURE update_position_prev();
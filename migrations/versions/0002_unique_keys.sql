@@ -0,0 +1,10 @@
+-- Уникальные ключи, по которым парсер выполняет INSERT ... ON CONFLICT.
+-- Перед созданием ключа по (repo_id, date) удаляются дубли, оставшиеся от повторных запусков парсера.
+
+CREATE UNIQUE INDEX IF NOT EXISTS top_repos_repo_key ON top_repos (repo);
+
+DELETE FROM repo_activity a
+USING repo_activity b
+WHERE a.repo_id = b.repo_id AND a.date = b.date AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS repo_activity_repo_id_date_key ON repo_activity (repo_id, date);
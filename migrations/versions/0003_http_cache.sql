@@ -0,0 +1,10 @@
+-- Кэш ответов GitHub API и их валидаторов (ETag / Last-Modified) для условных запросов парсера
+
+CREATE TABLE IF NOT EXISTS http_cache (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    payload JSONB NOT NULL,
+    link TEXT,
+    accessed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
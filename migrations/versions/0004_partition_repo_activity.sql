@@ -0,0 +1,55 @@
+-- Помесячное секционирование repo_activity по date.
+-- Первичный ключ (repo_id, date) служит индексом для запросов активности за период, а секции за месяцы
+-- вне периода отсекаются планировщиком. Строки вне существующих секций попадают в repo_activity_default
+-- и переносятся в месячную секцию при ее создании функцией ensure_repo_activity_partitions.
+
+ALTER TABLE repo_activity RENAME TO repo_activity_unpartitioned;
+ALTER TABLE repo_activity_unpartitioned RENAME CONSTRAINT repo_activity_pkey TO repo_activity_unpartitioned_pkey;
+
+CREATE TABLE repo_activity (
+    repo_id INTEGER REFERENCES top_repos(id) NOT NULL,
+    date DATE NOT NULL,
+    commits INTEGER NOT NULL,
+    authors TEXT[] NOT NULL,
+    PRIMARY KEY (repo_id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE repo_activity_default PARTITION OF repo_activity DEFAULT;
+
+-- Создает (если нет) месячные секции repo_activity_YYYY_MM, покрывающие период [since_date, until_date]
+CREATE OR REPLACE FUNCTION ensure_repo_activity_partitions(since_date DATE, until_date DATE) RETURNS void AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+BEGIN
+    IF since_date IS NULL OR until_date IS NULL THEN
+        RETURN;
+    END IF;
+
+    month_start := date_trunc('month', since_date)::date;
+    WHILE month_start <= until_date LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := format('repo_activity_%s', to_char(month_start, 'YYYY_MM'));
+
+        IF to_regclass(partition_name) IS NULL THEN
+            -- Строки месяца из секции по умолчанию переносятся в новую секцию до ее подключения
+            EXECUTE format('CREATE TABLE %I (LIKE repo_activity INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format('INSERT INTO %I SELECT * FROM repo_activity_default WHERE date >= $1 AND date < $2',
+                           partition_name) USING month_start, month_end;
+            DELETE FROM repo_activity_default WHERE date >= month_start AND date < month_end;
+            EXECUTE format('ALTER TABLE repo_activity ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, month_start, month_end);
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_repo_activity_partitions(MIN(date), MAX(date)) FROM repo_activity_unpartitioned;
+
+INSERT INTO repo_activity (repo_id, date, commits, authors)
+SELECT repo_id, date, commits, authors FROM repo_activity_unpartitioned;
+
+DROP TABLE repo_activity_unpartitioned;
@@ -0,0 +1,25 @@
+-- История снимков топа: позиция и счетчики каждого репозитория на каждую дату снимка.
+-- Первичный ключ (repo_id, snapshot_date) обслуживает запросы траектории репозитория за период,
+-- индекс (snapshot_date, position) - запрос топа на дату.
+
+CREATE TABLE IF NOT EXISTS top_repos_history (
+    repo_id INTEGER REFERENCES top_repos(id) NOT NULL,
+    snapshot_date DATE NOT NULL,
+    position INTEGER NOT NULL,
+    stars INTEGER NOT NULL,
+    watchers INTEGER NOT NULL,
+    forks INTEGER NOT NULL,
+    open_issues INTEGER NOT NULL,
+    language TEXT,
+    PRIMARY KEY (repo_id, snapshot_date)
+);
+
+CREATE INDEX IF NOT EXISTS top_repos_history_snapshot_date_position_idx
+    ON top_repos_history (snapshot_date, position);
+
+-- Текущий снимок становится первой записью истории
+INSERT INTO top_repos_history (repo_id, snapshot_date, position, stars, watchers, forks, open_issues, language)
+SELECT id, snapshot_date, position_cur, stars, watchers, forks, open_issues, language
+FROM top_repos
+WHERE position_cur IS NOT NULL
+ON CONFLICT DO NOTHING;
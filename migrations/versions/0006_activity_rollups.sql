@@ -0,0 +1,47 @@
+-- Недельные и месячные сводки активности: сумма коммитов и кол-во уникальных авторов за период.
+-- Парсер пересчитывает сводки периодов, затронутых записанной активностью, в каждом запуске.
+
+CREATE TABLE IF NOT EXISTS repo_activity_weekly (
+    repo_id INTEGER REFERENCES top_repos(id) NOT NULL,
+    period_start DATE NOT NULL,
+    commits INTEGER NOT NULL,
+    authors_count INTEGER NOT NULL,
+    PRIMARY KEY (repo_id, period_start)
+);
+
+CREATE TABLE IF NOT EXISTS repo_activity_monthly (
+    repo_id INTEGER REFERENCES top_repos(id) NOT NULL,
+    period_start DATE NOT NULL,
+    commits INTEGER NOT NULL,
+    authors_count INTEGER NOT NULL,
+    PRIMARY KEY (repo_id, period_start)
+);
+
+-- Сводки по уже накопленной активности
+INSERT INTO repo_activity_weekly (repo_id, period_start, commits, authors_count)
+SELECT c.repo_id, c.period_start, c.commits, COALESCE(u.authors_count, 0)
+FROM (
+    SELECT repo_id, date_trunc('week', date)::date AS period_start, SUM(commits) AS commits
+    FROM repo_activity
+    GROUP BY 1, 2
+) c
+LEFT JOIN (
+    SELECT repo_id, date_trunc('week', date)::date AS period_start, COUNT(DISTINCT author) AS authors_count
+    FROM repo_activity, unnest(authors) AS author
+    GROUP BY 1, 2
+) u USING (repo_id, period_start)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO repo_activity_monthly (repo_id, period_start, commits, authors_count)
+SELECT c.repo_id, c.period_start, c.commits, COALESCE(u.authors_count, 0)
+FROM (
+    SELECT repo_id, date_trunc('month', date)::date AS period_start, SUM(commits) AS commits
+    FROM repo_activity
+    GROUP BY 1, 2
+) c
+LEFT JOIN (
+    SELECT repo_id, date_trunc('month', date)::date AS period_start, COUNT(DISTINCT author) AS authors_count
+    FROM repo_activity, unnest(authors) AS author
+    GROUP BY 1, 2
+) u USING (repo_id, period_start)
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,28 @@
+-- Контрольные точки запусков парсера: снимок топа запуска и состояние сбора активности каждого репозитория.
+-- Запуск, прерванный по сроку вызова функции, продолжается следующим вызовом с сохраненных курсоров.
+
+CREATE TABLE IF NOT EXISTS parser_runs (
+    id SERIAL PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ,
+    -- Репозитории топа на момент запуска (models.Repo)
+    repos JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS parser_runs_unfinished_idx ON parser_runs (started_at) WHERE finished_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS parser_run_repos (
+    run_id INTEGER REFERENCES parser_runs(id) ON DELETE CASCADE NOT NULL,
+    repo TEXT NOT NULL,
+    -- pending - не обработан или приостановлен, done - активность записана, failed - ошибка
+    status TEXT NOT NULL DEFAULT 'pending',
+    -- Дата, начиная с которой запрашивается история (фиксируется при первом запросе)
+    since DATE,
+    -- Следующая страница истории: номер страницы REST API или курсор GraphQL API
+    cursor TEXT,
+    pages INTEGER NOT NULL DEFAULT 0,
+    -- Агрегация по дням уже загруженных страниц приостановленного репозитория
+    partial JSONB,
+    PRIMARY KEY (run_id, repo)
+);
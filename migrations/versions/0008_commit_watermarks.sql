@@ -0,0 +1,25 @@
+-- Отметка загруженной истории коммитов каждого репозитория: новейшая дата коммита (committer date, по ней
+-- фильтрует параметр since GitHub API) и SHA коммитов с этой датой. Следующий запуск запрашивает историю
+-- начиная с отметки и добавляет новые коммиты к строкам repo_activity, а не перезаписывает их.
+
+CREATE TABLE IF NOT EXISTS repo_commit_watermarks (
+    repo_id INTEGER PRIMARY KEY REFERENCES top_repos(id),
+    committed_at TIMESTAMPTZ NOT NULL,
+    -- Уже учтенные коммиты с датой committed_at (since включает границу)
+    shas TEXT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Для уже собранной активности отметка - начало дня после последнего записанного (прежняя граница since)
+INSERT INTO repo_commit_watermarks (repo_id, committed_at)
+SELECT repo_id, (MAX(date) + 1)::timestamp AT TIME ZONE 'UTC'
+FROM repo_activity
+GROUP BY repo_id
+ON CONFLICT DO NOTHING;
+
+-- Контрольная точка запуска хранит отметку до запуска (since, since_shas) и новейший загруженный коммит
+ALTER TABLE parser_run_repos
+    ALTER COLUMN since TYPE TIMESTAMPTZ USING since::timestamp AT TIME ZONE 'UTC',
+    ADD COLUMN IF NOT EXISTS since_shas TEXT[],
+    ADD COLUMN IF NOT EXISTS newest_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS newest_shas TEXT[];
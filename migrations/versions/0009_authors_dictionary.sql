@@ -0,0 +1,25 @@
+-- Словарь авторов: имена хранятся один раз, строки repo_activity содержат массив их id (author_ids).
+-- Уникальные авторы за период считаются по целым числам, имена подставляются только в ответ.
+
+CREATE TABLE IF NOT EXISTS authors (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+INSERT INTO authors (name)
+SELECT DISTINCT author FROM repo_activity, unnest(authors) AS author
+ORDER BY 1
+ON CONFLICT DO NOTHING;
+
+ALTER TABLE repo_activity ADD COLUMN author_ids INTEGER[];
+
+UPDATE repo_activity a
+SET author_ids = ARRAY(SELECT au.id FROM unnest(a.authors) AS author JOIN authors au ON au.name = author ORDER BY 1);
+
+ALTER TABLE repo_activity ALTER COLUMN author_ids SET NOT NULL;
+ALTER TABLE repo_activity DROP COLUMN authors;
+
+-- Имена авторов по массиву id, упорядоченные по имени (для ответов API и выгрузки)
+CREATE OR REPLACE FUNCTION author_names(ids INTEGER[]) RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_agg(name ORDER BY name), '{}') FROM authors WHERE id = ANY(ids)
+$$ LANGUAGE sql STABLE;
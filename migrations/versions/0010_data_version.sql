@@ -0,0 +1,11 @@
+-- Версия данных API: увеличивается каждой записью парсера (снимок топа, активность, отметки истории) и заменой
+-- активности (backfill.py). API строит из нее ETag ответов, поэтому ответ меняется с каждой записью, а не только
+-- с датой снимка (возобновленные и инкрементальные запуски пишут активность несколько раз за день).
+
+CREATE TABLE IF NOT EXISTS data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO data_version DEFAULT VALUES ON CONFLICT DO NOTHING;
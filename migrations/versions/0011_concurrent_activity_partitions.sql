@@ -0,0 +1,47 @@
+-- Безопасное при одновременных вызовах создание месячных секций repo_activity.
+-- Отсутствующие секции создаются под advisory lock 727100003 (до конца транзакции вызова): одновременные вызовы
+-- создают их по очереди и после ожидания видят уже созданные. Секция, созданная вызовом без блокировки,
+-- пропускается (duplicate_table). Существующие секции проверяются без блокировки. Вызывать в отдельной
+-- короткой транзакции: ATTACH PARTITION блокирует repo_activity_default (и чтение repo_activity) до ее конца.
+
+CREATE OR REPLACE FUNCTION ensure_repo_activity_partitions(since_date DATE, until_date DATE) RETURNS void AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    locked BOOLEAN := FALSE;
+BEGIN
+    IF since_date IS NULL OR until_date IS NULL THEN
+        RETURN;
+    END IF;
+
+    month_start := date_trunc('month', since_date)::date;
+    WHILE month_start <= until_date LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := format('repo_activity_%s', to_char(month_start, 'YYYY_MM'));
+
+        IF to_regclass(partition_name) IS NULL THEN
+            IF NOT locked THEN
+                PERFORM pg_advisory_xact_lock(727100003);
+                locked := TRUE;
+            END IF;
+            BEGIN
+                -- Повторная проверка после ожидания блокировки: секцию мог создать другой вызов
+                IF to_regclass(partition_name) IS NULL THEN
+                    -- Строки месяца из секции по умолчанию переносятся в новую секцию до ее подключения
+                    EXECUTE format('CREATE TABLE %I (LIKE repo_activity INCLUDING DEFAULTS)', partition_name);
+                    EXECUTE format('INSERT INTO %I SELECT * FROM repo_activity_default WHERE date >= $1 AND date < $2',
+                                   partition_name) USING month_start, month_end;
+                    DELETE FROM repo_activity_default WHERE date >= month_start AND date < month_end;
+                    EXECUTE format('ALTER TABLE repo_activity ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                                   partition_name, month_start, month_end);
+                END IF;
+            EXCEPTION WHEN duplicate_table THEN
+                NULL;
+            END;
+        END IF;
+
+        month_start := month_end;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,135 @@
+from datetime import date, datetime, timezone
+
+
+def commit_day(timestamp):
+    """ Возвращает день коммита по UTC в формате YYYY-MM-DD.
+
+    Для формата GitHub REST API (YYYY-MM-DDTHH:MM:SSZ) день берется срезом строки без разбора даты,
+    остальные ISO 8601 даты (со смещением, как в GraphQL API) приводятся к UTC.
+
+    :param timestamp: Дата коммита в формате ISO 8601"""
+    if len(timestamp) == 20 and timestamp[19] == 'Z':
+        return timestamp[:10]
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).date().isoformat()
+
+
+def commit_timestamp(timestamp):
+    """ Приводит дату коммита к UTC в формате YYYY-MM-DDTHH:MM:SSZ (такие строки сравниваются как даты).
+
+    :param timestamp: Дата в формате ISO 8601 или datetime"""
+    if isinstance(timestamp, str):
+        if len(timestamp) == 20 and timestamp[19] == 'Z':
+            return timestamp
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Watermark:
+    """ Отметка истории коммитов: новейшая дата коммитера и SHA коммитов с этой датой. """
+
+    def __init__(self, committed_at=None, shas=()):
+        """
+        :param committed_at: Дата коммитера (ISO 8601 или datetime), None - история еще не загружалась
+        :param shas: SHA коммитов с датой committed_at
+        """
+        self.committed_at = commit_timestamp(committed_at) if committed_at is not None else None
+        self.shas = set(shas)
+
+    def __bool__(self):
+        return self.committed_at is not None
+
+    def as_datetime(self):
+        return datetime.fromisoformat(self.committed_at.replace('Z', '+00:00')) if self else None
+
+    def advance(self, commits):
+        """ Сдвигает отметку к новейшему из коммитов (в формате ответа /repos/{repo}/commits). """
+        for commit in commits:
+            timestamp = commit_timestamp(commit['commit']['committer']['date'])
+            if self.committed_at is None or timestamp > self.committed_at:
+                self.committed_at, self.shas = timestamp, {commit['sha']}
+            elif timestamp == self.committed_at:
+                self.shas.add(commit['sha'])
+
+    def after(self, commits):
+        """ Коммиты после отметки: параметр since GitHub API включает границу, поэтому уже учтенные коммиты
+        с датой отметки пропускаются. """
+        if self.committed_at is None:
+            return commits
+        return [
+            commit for commit in commits
+            if (timestamp := commit_timestamp(commit['commit']['committer']['date'])) > self.committed_at
+            or (timestamp == self.committed_at and commit['sha'] not in self.shas)
+        ]
+
+    def upto(self, commits):
+        """ Коммиты до отметки включительно: с более ранней датой или с датой отметки и учтенным SHA. """
+        if self.committed_at is None:
+            return commits
+        return [
+            commit for commit in commits
+            if (timestamp := commit_timestamp(commit['commit']['committer']['date'])) < self.committed_at
+            or (timestamp == self.committed_at and commit['sha'] in self.shas)
+        ]
+
+
+def add_commits_after(commits_by_date, commits, since: Watermark, newest: Watermark):
+    """ Добавляет в агрегацию по дням только коммиты после отметки since и сдвигает отметку newest.
+
+    :param commits_by_date: Словарь {YYYY-MM-DD: {'commits': кол-во, 'authors': множество авторов}}
+    :param commits: Коммиты из ответа GitHub (с sha и датой коммитера)
+    :param since: Отметка до запуска
+    :param newest: Новейший загруженный коммит запуска"""
+    newest.advance(commits)
+    return add_commits(commits_by_date, since.after(commits))
+
+
+def add_commits(commits_by_date, commits):
+    """ Добавляет коммиты (в формате ответа /repos/{repo}/commits) в агрегацию по дням.
+
+    :param commits_by_date: Словарь {YYYY-MM-DD: {'commits': кол-во, 'authors': множество авторов}}
+    :param commits: Коммиты из ответа GitHub"""
+    for commit in commits:
+        author = commit['commit']['author']
+        timestamp = author['date']
+        day = timestamp[:10] if len(timestamp) == 20 and timestamp[19] == 'Z' else commit_day(timestamp)
+        bucket = commits_by_date.get(day)
+        if bucket is None:
+            bucket = commits_by_date[day] = {'commits': 0, 'authors': set()}
+        bucket['commits'] += 1
+        bucket['authors'].add(author['name'])
+    return commits_by_date
+
+
+def add_commits_batch(commits_by_repo, pages):
+    """ Добавляет страницы коммитов нескольких репозиториев в их агрегации.
+
+    :param commits_by_repo: Словарь {repo: агрегация по дням}, недостающие агрегации создаются
+    :param pages: Словарь {repo: коммиты из ответа GitHub}"""
+    for repo, commits in pages.items():
+        add_commits(commits_by_repo.setdefault(repo, {}), commits)
+    return commits_by_repo
+
+
+def to_activities(commits_by_date):
+    """ Преобразует агрегацию по дням в список данных активности (models.Activity), упорядоченный по дате.
+
+    :param commits_by_date: Словарь {YYYY-MM-DD: {'commits': кол-во, 'authors': множество авторов}}"""
+    return [
+        {'date': date.fromisoformat(day), 'commits': bucket['commits'], 'authors': bucket['authors']}
+        for day, bucket in sorted(commits_by_date.items())
+    ]
+
+
+def aggregate_commits(commits):
+    """ Агрегирует коммиты одного репозитория в список данных активности по дням.
+
+    :param commits: Коммиты из ответа GitHub"""
+    return to_activities(add_commits({}, commits))
+
+
+def aggregate_commits_batch(commits_by_repo):
+    """ Агрегирует коммиты нескольких репозиториев.
+
+    :param commits_by_repo: Словарь {repo: коммиты из ответа GitHub}
+    :return: Словарь {repo: список данных активности по дням}"""
+    return {repo: to_activities(by_date) for repo, by_date in add_commits_batch({}, commits_by_repo).items()}
@@ -0,0 +1,328 @@
+""" Загрузка всей истории коммитов репозиториев окнами дат.
+
+История репозитория делится на окна since/until по BACKFILL_WINDOW_DAYS дней, окна всех репозиториев
+запрашиваются параллельно (не более BACKFILL_CONCURRENCY одновременно) через общий GithubClient с пулом
+токенов. Собранная активность заменяет всю активность репозитория в repo_activity (см.
+ParserPostgres.replace_repo_activity): история собирается до текущей отметки репозитория, поэтому коммиты,
+уже добавленные парсером после отметки, не учитываются дважды. Замены выполняются после сбора истории всех
+репозиториев, когда секции repo_activity для нее уже созданы. Запускать между запусками парсера: коммиты
+незавершенного запуска могут быть учтены повторно.
+
+Ответы GitHub можно записать в каталог (--record) и позже повторить без запросов к GitHub (--replay),
+например, чтобы пересобрать активность в новой БД, не расходуя лимит запросов.
+
+Запуск:
+    python backfill.py --repo owner/name [--repo ...] [--record DIR]
+    python backfill.py --replay DIR [--repo owner/name ...] [--dry-run]
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from aggregation import Watermark, add_commits, commit_timestamp, to_activities
+from commits_decoder import decode_commits, read_commits
+from http_cache import HttpCache, parse_link_header
+from settings import GITHUB_REPO_ACTIVITY_ENDPOINT, GITHUB_TOKENS, GITHUB_MAX_RETRIES, GITHUB_RETRY_BACKOFF, \
+    COMMITS_PER_PAGE, BACKFILL_WINDOW_DAYS, BACKFILL_CONCURRENCY, PARSER_CONCURRENCY, POSTGRES_HOST, POSTGRES_PORT, \
+    POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB
+
+
+# Загрузка истории не ограничена сроком вызова функции: при исчерпании лимита всех токенов ожидает
+# его восстановления (GitHub восстанавливает лимит раз в час)
+BACKFILL_RATELIMIT_MAX_WAIT = 3600
+
+# Формат параметров since/until GitHub API
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def plan_windows(start, end, window_days):
+    """ Делит историю на окна [since, until] без пересечений (until окна на секунду раньше since следующего).
+    Первое окно без since: в него попадают и коммиты с датой раньше start.
+
+    :param start: Дата самого старого коммита (datetime) или None, если история пуста
+    :param end: Конец истории (datetime), включительно
+    :param window_days: Длительность окна в днях
+    :return: Список (since, until) строк в формате GitHub API, since первого окна - None"""
+    bounds = []
+    if start is not None:
+        bound = start + timedelta(days=window_days)
+        while bound < end:
+            bounds.append(bound)
+            bound += timedelta(days=window_days)
+    sinces = [None, *bounds]
+    untils = [*(bound - timedelta(seconds=1) for bound in bounds), end]
+    return [(since and since.strftime(TIMESTAMP_FORMAT), until.strftime(TIMESTAMP_FORMAT))
+            for since, until in zip(sinces, untils)]
+
+
+class ResponseArchive:
+    """ Каталог с записанными ответами GitHub: тело каждого ответа и его заголовок Link в отдельном файле gzip
+    (имя - SHA1 ключа запроса HttpCache.make_key) и manifest.json с окнами и отметками истории репозиториев. """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path):
+        """
+        :param path: Путь к каталогу (создается при первой записи)
+        """
+        self.path = Path(path)
+
+    def _file(self, key):
+        return self.path / f"{hashlib.sha1(key.encode()).hexdigest()}.json.gz"
+
+    def write(self, key, link, body):
+        """ Записывает ответ. Файл появляется целиком (через переименование временного файла).
+
+        :param key: Ключ запроса
+        :param link: Заголовок Link ответа
+        :param body: Байты тела ответа"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self._file(key)
+        tmp = file.with_suffix('.tmp')
+        with gzip.open(tmp, 'wb', compresslevel=6) as output:
+            output.write(json.dumps({'url': key, 'link': link}).encode() + b'\n')
+            output.write(body)
+        tmp.replace(file)
+
+    def read(self, key):
+        """ Читает записанный ответ.
+
+        :param key: Ключ запроса
+        :return: (заголовок Link, байты тела ответа)"""
+        try:
+            with gzip.open(self._file(key), 'rb') as source:
+                data = source.read()
+        except FileNotFoundError:
+            raise KeyError(f"Response is not recorded: {key}")
+        meta, body = data.split(b'\n', 1)
+        return json.loads(meta)['link'], body
+
+    def load_manifest(self):
+        """ Окна и отметки записанных репозиториев: {repo: {'windows', 'cutoff', 'watermark'}}. """
+        try:
+            return json.loads((self.path / self.MANIFEST).read_text())
+        except FileNotFoundError:
+            return {}
+
+    def save_manifest(self, manifest):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / f"{self.MANIFEST}.tmp"
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        tmp.replace(self.path / self.MANIFEST)
+
+
+class Backfill:
+    """ Загрузка всей истории коммитов репозиториев окнами дат из GitHub (с записью ответов в архив)
+    или из архива записанных ответов. """
+
+    def __init__(self, db, client=None, archive: ResponseArchive = None, replay=False,
+                 window_days=BACKFILL_WINDOW_DAYS, concurrency=BACKFILL_CONCURRENCY, dry_run=False):
+        """
+        :param db: Подключение к БД (ParserPostgres).
+        :param client: GithubClient (не нужен при повторе из архива).
+        :param archive: Архив ответов: в него записываются ответы GitHub или из него они читаются (replay).
+        :param replay: Читать ответы из архива вместо запросов к GitHub.
+        :param window_days: Длительность окна истории в днях.
+        :param concurrency: Кол-во одновременно запрашиваемых окон.
+        :param dry_run: Не записывать активность в БД (только собрать и вывести сводку).
+        """
+        self.db = db
+        self.client = client
+        self.archive = archive
+        self.replay = replay
+        self.window_days = window_days
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.dry_run = dry_run
+        self.manifest = archive.load_manifest() if archive is not None else {}
+        self.pages = 0
+
+    async def run(self, repos):
+        """ Загружает историю репозиториев. Ошибка одного репозитория не прерывает загрузку остальных.
+
+        :param repos: Полные названия репозиториев (при повторе без списка - все репозитории архива)
+        :return: Словарь {repo: кол-во дней активности или None, если активность не записана}"""
+        if self.replay and not repos:
+            repos = sorted(self.manifest)
+        started = time.perf_counter()
+        watermarks = await self.db.get_commit_watermarks(repos)
+        collected = await asyncio.gather(*(self._collect_repo(repo, watermarks.get(repo)) for repo in repos))
+        if self.dry_run:
+            results = [len(result[0]) if result is not None else None for result in collected]
+        else:
+            # Секции repo_activity для всей собранной истории создаются один раз до параллельных замен: иначе
+            # замены создавали бы одни и те же секции, ожидая блокировок друг друга
+            await self.db.ensure_activity_partitions({
+                repo: result[0] for repo, result in zip(repos, collected) if result is not None
+            })
+            results = await asyncio.gather(*(self._replace_repo(repo, result)
+                                             for repo, result in zip(repos, collected)))
+        elapsed = time.perf_counter() - started
+        logging.info(f"Backfilled {sum(result is not None for result in results)} of {len(repos)} repos: "
+                     f"{self.pages} pages in {elapsed:.2f}s ({self.pages / max(elapsed, 1e-9):.1f} pages/s)")
+        return dict(zip(repos, results))
+
+    async def _collect_repo(self, repo, current):
+        """ Собирает историю одного репозитория.
+
+        :param repo: Полное название репозитория
+        :param current: Отметка истории в БД (дата, [sha]) или None
+        :return: (список данных активности, новая отметка или None, отметка в БД) или None при ошибке"""
+        try:
+            if self.replay:
+                recorded = self.manifest.get(repo)
+                if recorded is None:
+                    raise KeyError(f"Repo is not recorded in {self.archive.path}")
+                windows = [tuple(window) for window in recorded['windows']]
+                cutoff = Watermark(*recorded['cutoff'])
+                # Записанная история заканчивается отметкой на момент записи: в новой БД (без отметки)
+                # она записывается целиком, иначе отметка в БД должна совпадать
+                recorded_watermark = Watermark(*(recorded['watermark'] or ()))
+                if current is not None and not self._same(Watermark(*current), recorded_watermark):
+                    logging.warning(f"Commit watermark of {repo} differs from the recorded one, skipped")
+                    return None
+            else:
+                # История собирается до отметки в БД или до начала загрузки, если отметки нет
+                cutoff = Watermark(*current) if current is not None \
+                    else Watermark(datetime.now(timezone.utc).replace(microsecond=0))
+                windows = plan_windows(await self._history_start(repo, cutoff), cutoff.as_datetime(),
+                                       self.window_days)
+
+            commits_by_date, newest = {}, Watermark()
+            await asyncio.gather(*(self._fetch_window(repo, since, until, cutoff, commits_by_date, newest)
+                                   for since, until in windows))
+            activities = to_activities(commits_by_date)
+            logging.info(f"Fetched history of {repo}: {len(windows)} windows, {len(activities)} days, "
+                         f"{sum(activity['commits'] for activity in activities)} commits")
+
+            if self.archive is not None and not self.replay:
+                self.manifest[repo] = {
+                    'windows': windows,
+                    'cutoff': [cutoff.committed_at, sorted(cutoff.shas)],
+                    'watermark': [commit_timestamp(current[0]), sorted(current[1])] if current else None,
+                }
+                self.archive.save_manifest(self.manifest)
+
+            # Существующая отметка не меняется: история собрана ровно до нее
+            watermark = (newest.as_datetime(), sorted(newest.shas)) if newest and current is None else None
+            return activities, watermark, current
+        except Exception as e:
+            logging.error(f"Failed to backfill repo {repo}: {e!r}")
+            return None
+
+    async def _replace_repo(self, repo, collected):
+        """ Заменяет активность репозитория в БД собранной историей.
+
+        :param repo: Полное название репозитория
+        :param collected: Результат _collect_repo
+        :return: Кол-во дней активности или None"""
+        if collected is None:
+            return None
+        activities, watermark, current = collected
+        try:
+            replaced = await self.db.replace_repo_activity(repo, activities, watermark, current)
+            return len(activities) if replaced else None
+        except Exception as e:
+            logging.error(f"Failed to backfill repo {repo}: {e!r}")
+            return None
+
+    @staticmethod
+    def _same(first: Watermark, second: Watermark):
+        return (first.committed_at, first.shas) == (second.committed_at, second.shas)
+
+    async def _history_start(self, repo, cutoff: Watermark):
+        """ Дата самого старого коммита истории до отметки: последняя страница списка коммитов по одному
+        коммиту на страницу (два запроса). None - история пуста. """
+        url = f"{GITHUB_REPO_ACTIVITY_ENDPOINT}/{repo}/commits"
+        params = {'per_page': 1, 'until': cutoff.committed_at}
+        async with self.semaphore:
+            commits, links = await self._get_page(url, params)
+            last_url = links.get('last', {}).get('url')
+            if last_url is not None:
+                commits, _ = await self._get_page(str(last_url))
+        if not commits:
+            return None
+        return datetime.fromisoformat(commit_timestamp(commits[-1]['commit']['committer']['date'])
+                                      .replace('Z', '+00:00'))
+
+    async def _fetch_window(self, repo, since, until, cutoff: Watermark, commits_by_date, newest: Watermark):
+        """ Запрашивает все страницы окна истории (по ссылкам rel="next") и добавляет коммиты до отметки cutoff
+        в агрегацию репозитория. """
+        url = f"{GITHUB_REPO_ACTIVITY_ENDPOINT}/{repo}/commits"
+        params = {'per_page': COMMITS_PER_PAGE, 'until': until}
+        if since is not None:
+            params['since'] = since
+        async with self.semaphore:
+            while url is not None:
+                commits, links = await self._get_page(url, params)
+                commits = cutoff.upto(commits)
+                newest.advance(commits)
+                add_commits(commits_by_date, commits)
+                next_url = links.get('next', {}).get('url')
+                url, params = (str(next_url) if next_url is not None else None), None
+
+    async def _get_page(self, url, params=None):
+        """ Страница коммитов из GitHub (ответ записывается в архив, если он задан) или из архива.
+
+        :return: (список коммитов, ссылки из заголовка Link)"""
+        key = HttpCache.make_key(url, params)
+        self.pages += 1
+        if self.replay:
+            link, body = await asyncio.to_thread(self.archive.read, key)
+            return await asyncio.to_thread(decode_commits, body), parse_link_header(link)
+
+        async with self.client.request('GET', url, 'commits', params=params) as response:
+            response.raise_for_status()
+            link = response.headers.get('Link')
+            if self.archive is None:
+                return await read_commits(response), parse_link_header(link)
+            body = await response.read()
+        await asyncio.to_thread(self.archive.write, key, link, body)
+        return decode_commits(body), parse_link_header(link)
+
+
+async def main(args):
+    import aiohttp
+    from db.postgres import ParserPostgres
+    from github_client import GithubClient
+    from metrics import RunMetrics
+    from parser import GithubParser
+
+    archive = ResponseArchive(args.replay or args.record) if args.replay or args.record else None
+    db = ParserPostgres(db_host=POSTGRES_HOST, db_port=POSTGRES_PORT, db_name=POSTGRES_DB, db_user=POSTGRES_USER,
+                        db_pass=POSTGRES_PASSWORD)
+    await db.connect()
+    try:
+        if args.replay:
+            return await Backfill(db, archive=archive, replay=True, concurrency=args.concurrency,
+                                  dry_run=args.dry_run).run(args.repo)
+        connector = GithubParser.make_connector(max(args.concurrency, PARSER_CONCURRENCY))
+        async with aiohttp.ClientSession(connector=connector) as session:
+            client = GithubClient(session, GITHUB_TOKENS, RunMetrics(), GITHUB_MAX_RETRIES, GITHUB_RETRY_BACKOFF,
+                                  BACKFILL_RATELIMIT_MAX_WAIT)
+            return await Backfill(db, client, archive, window_days=args.window_days, concurrency=args.concurrency,
+                                  dry_run=args.dry_run).run(args.repo)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", action="append", default=[], help="owner/name, можно указать несколько раз")
+    parser.add_argument("--window-days", type=int, default=BACKFILL_WINDOW_DAYS)
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    parser.add_argument("--record", metavar="DIR", help="записать ответы GitHub в каталог")
+    parser.add_argument("--replay", metavar="DIR", help="повторить записанные ответы вместо запросов к GitHub")
+    parser.add_argument("--dry-run", action="store_true", help="не записывать активность в БД")
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if not args.repo and not args.replay:
+        parser.error("at least one --repo is required")
+    asyncio.run(main(args))
@@ -0,0 +1,113 @@
+import json
+from datetime import datetime, timezone
+
+from aggregation import Watermark
+from models import Repo
+
+
+# Статусы репозитория в запуске
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RepoProgress:
+    """ Состояние сбора активности одного репозитория в запуске. """
+
+    def __init__(self, status=PENDING, since: Watermark = None, cursor=None, pages=0, commits_by_date=None,
+                 newest: Watermark = None):
+        """
+        :param status: PENDING, DONE или FAILED
+        :param since: Отметка истории до запуска, история запрашивается начиная с нее (пустая - вся история)
+        :param cursor: Следующая страница истории (None - история еще не запрашивалась)
+        :param pages: Кол-во загруженных страниц истории
+        :param commits_by_date: Агрегация загруженных страниц {YYYY-MM-DD: {'commits': кол-во, 'authors': set}}
+        :param newest: Новейший коммит загруженных страниц - отметка после завершения репозитория
+        """
+        self.status = status
+        self.since = since if since is not None else Watermark()
+        self.cursor = cursor
+        self.pages = pages
+        self.commits_by_date = commits_by_date if commits_by_date is not None else {}
+        self.newest = newest if newest is not None else Watermark()
+
+    @property
+    def started(self):
+        return self.pages > 0
+
+
+class RunCheckpoint:
+    """ Контрольная точка запуска парсера: топ запуска и состояние каждого репозитория.
+
+    Сохраняется в БД в одной транзакции с активностью завершенных репозиториев (ParserPostgres.save_snapshot),
+    поэтому повторный вызов продолжает запуск без повторной загрузки и записи уже обработанных репозиториев. """
+
+    def __init__(self, run_id, started_at: datetime, repos: list[Repo], progress: dict):
+        """
+        :param run_id: Идентификатор запуска в БД (None - запуск еще не сохранен)
+        :param started_at: Время начала запуска
+        :param repos: Репозитории топа
+        :param progress: Словарь {repo: RepoProgress}
+        """
+        self.run_id = run_id
+        self.started_at = started_at
+        self.repos = repos
+        self.progress = progress
+
+    @classmethod
+    def new(cls, repos: list[Repo]):
+        return cls(None, datetime.now(timezone.utc), repos, {repo.repo: RepoProgress() for repo in repos})
+
+    @classmethod
+    def from_db(cls, run, rows):
+        """ Восстанавливает контрольную точку из записей parser_runs и parser_run_repos. """
+        progress = {}
+        for row in rows:
+            partial = json.loads(row['partial']) if row['partial'] else {}
+            progress[row['repo']] = RepoProgress(
+                row['status'], Watermark(row['since'], row['since_shas'] or ()), row['cursor'], row['pages'],
+                {day: {'commits': bucket['commits'], 'authors': set(bucket['authors'])}
+                 for day, bucket in partial.items()},
+                Watermark(row['newest_at'], row['newest_shas'] or ())
+            )
+        return cls(run['id'], run['started_at'], [Repo(**repo) for repo in json.loads(run['repos'])], progress)
+
+    @property
+    def until(self) -> datetime:
+        """ Граница истории коммитов запуска - время начала запуска (с точностью до секунды). Все вызовы запуска
+        запрашивают один и тот же период, поэтому страницы истории не сдвигаются между вызовами. """
+        return self.started_at.astimezone(timezone.utc).replace(microsecond=0)
+
+    @property
+    def finished(self):
+        return all(progress.status != PENDING for progress in self.progress.values())
+
+    def pending_repos(self):
+        return [repo for repo in self.repos if self.progress[repo.repo].status == PENDING]
+
+    def records(self):
+        """ Записи parser_run_repos: (repo, status, since, since_shas, cursor, pages, partial, newest_at,
+        newest_shas). Агрегация хранится только у приостановленных репозиториев, активность завершенных уже
+        записана в repo_activity. """
+        return [
+            (repo, progress.status,
+             progress.since.as_datetime(), sorted(progress.since.shas) if progress.since else None,
+             progress.cursor, progress.pages,
+             json.dumps({day: {'commits': bucket['commits'], 'authors': sorted(bucket['authors'])}
+                         for day, bucket in progress.commits_by_date.items()})
+             if progress.status == PENDING and progress.commits_by_date else None,
+             progress.newest.as_datetime(), sorted(progress.newest.shas) if progress.newest else None)
+            for repo, progress in self.progress.items()
+        ]
+
+    def summary(self):
+        """ Сколько репозиториев запуска обработано. """
+        statuses = [progress.status for progress in self.progress.values()]
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at.isoformat(),
+            'done': statuses.count(DONE),
+            'failed': statuses.count(FAILED),
+            'pending': statuses.count(PENDING),
+            'finished': self.finished,
+        }
@@ -0,0 +1,152 @@
+import codecs
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Размер читаемой из ответа части тела, байт
+CHUNK_SIZE = 64 * 1024
+
+# Граница элементов массива коммитов: конец объекта, запятая и начало следующего коммита
+COMMIT_BOUNDARY_RE = re.compile(rb'}\s*,\s*{\s*"sha"\s*:')
+
+
+def project_commit(commit):
+    """ Оставляет в коммите только SHA, дату и имя автора и дату коммитера (для отметки истории).
+
+    :param commit: Коммит из ответа /repos/{repo}/commits"""
+    return {'sha': commit['sha'],
+            'commit': {'author': {'date': commit['commit']['author']['date'],
+                                  'name': commit['commit']['author']['name']},
+                       'committer': {'date': commit['commit']['committer']['date']}}}
+
+
+class BatchCommitsDecoder:
+    """ Потоковый разбор страницы коммитов orjson: по мере получения тела полученные целиком элементы массива
+    разбираются одним вызовом orjson.loads и сразу сокращаются до нужных полей.
+
+    Граница элементов - '}, {"sha":' вне строк (в строках JSON кавычки экранированы). Такая же последовательность
+    встречается между родителями merge коммита, поэтому срез проверяется разбором: при ошибке берется
+    предыдущая граница. Без найденных границ (другой формат ответа) тело разбирается целиком в close(). """
+
+    def __init__(self):
+        self.commits = []
+        self._buffer = b''
+        self._started = False
+
+    def feed(self, chunk):
+        """ Разбирает очередную часть тела ответа.
+
+        :param chunk: Байты тела ответа"""
+        self._buffer += chunk
+        if not self._started:
+            body = self._buffer.lstrip()
+            if not body:
+                return
+            if body[:1] != b'[':
+                raise ValueError(f"Expected JSON array of commits, got {body[:1]!r}")
+            self._buffer, self._started = body[1:], True
+        for boundary in reversed([match.start() for match in COMMIT_BOUNDARY_RE.finditer(self._buffer)]):
+            try:
+                commits = orjson.loads(b'[' + self._buffer[:boundary + 1] + b']')
+            except orjson.JSONDecodeError:
+                continue
+            self.commits.extend(project_commit(commit) for commit in commits)
+            # Остаток начинается с запятой перед следующим элементом
+            self._buffer = self._buffer[boundary + 1:].lstrip()[1:]
+            break
+
+    def close(self):
+        """ Завершает разбор и возвращает коммиты страницы. """
+        if not self._started:
+            raise ValueError("Unexpected end of commits page")
+        commits = orjson.loads(b'[' + self._buffer)
+        self.commits.extend(project_commit(commit) for commit in commits)
+        self._buffer = b''
+        return self.commits
+
+
+class ArrayCommitsDecoder:
+    """ Потоковый разбор страницы коммитов стандартным json: элементы массива декодируются по одному по мере
+    получения тела (json.JSONDecoder.raw_decode) и сразу сокращаются до нужных полей. В памяти остаются
+    только проекции коммитов и еще не разобранный хвост тела. """
+
+    def __init__(self):
+        self.commits = []
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._started = False
+        self._finished = False
+
+    def feed(self, chunk):
+        """ Разбирает очередную часть тела ответа.
+
+        :param chunk: Байты тела ответа"""
+        self._buffer += self._text.decode(chunk)
+        self._consume(final=False)
+
+    def close(self):
+        """ Завершает разбор и возвращает коммиты страницы. """
+        self._buffer += self._text.decode(b'', final=True)
+        self._consume(final=True)
+        if not self._finished:
+            raise ValueError("Unexpected end of commits page")
+        return self.commits
+
+    def _consume(self, final):
+        buffer, pos = self._buffer, 0
+        while not self._finished:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not self._started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Expected JSON array of commits, got {buffer[pos]!r}")
+                self._started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                self._finished = True
+                pos += 1
+                break
+            try:
+                commit, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент еще не получен целиком - ждет следующей части тела
+                if final:
+                    raise
+                break
+            self.commits.append(project_commit(commit))
+        self._buffer = buffer[pos:]
+
+
+def make_commits_decoder():
+    """ Декодер страницы коммитов: на orjson, если он установлен, иначе на стандартном json. """
+    return BatchCommitsDecoder() if orjson is not None else ArrayCommitsDecoder()
+
+
+def decode_commits(body):
+    """ Разбирает уже прочитанное тело страницы коммитов (например, сохраненный ответ, см. backfill.py).
+
+    :param body: Байты тела ответа /repos/{repo}/commits
+    :return: Коммиты с SHA, датой и именем автора и датой коммитера"""
+    decoder = make_commits_decoder()
+    for start in range(0, len(body), CHUNK_SIZE):
+        decoder.feed(body[start:start + CHUNK_SIZE])
+    return decoder.close()
+
+
+async def read_commits(response):
+    """ Читает тело ответа /repos/{repo}/commits по частям и разбирает его, не загружая в память целиком.
+
+    :param response: aiohttp.ClientResponse
+    :return: Коммиты с SHA, датой и именем автора и датой коммитера"""
+    decoder = make_commits_decoder()
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        decoder.feed(chunk)
+    return decoder.close()
@@ -1,6 +1,20 @@
 import asyncpg
+import json
 import logging
 
+from settings import TOP_REPOS_SNAPSHOT_CHANNEL
+
+
+# Таблицы сводок активности и периоды, за которые они считаются
+ACTIVITY_ROLLUPS = (
+    ('repo_activity_weekly', 'week'),
+    ('repo_activity_monthly', 'month'),
+)
+
+# Класс advisory lock истории репозитория (второй ключ - id репозитория): запись активности и отметки парсером
+# и замена активности (backfill.py) выполняются по очереди
+REPO_HISTORY_LOCK = 727_100_002
+
 
 class ParserPostgres:
     def __init__(self, db_host, db_port, db_name, db_user, db_pass):
@@ -10,6 +24,8 @@ class ParserPostgres:
         self.db_user = db_user
         self.db_pass = db_pass
         self.pool = None
+        # Id авторов, уже записанных в словарь authors: {имя: id}
+        self.author_ids = {}
 
     async def connect(self):
         """ Подключиться к PostgreSQL базе """
@@ -48,114 +64,491 @@ class ParserPostgres:
         await self.pool.close()
         logging.info("Closed connection to PostgreSQL")
 
-    async def get_repo_id_by_name_and_owner(self, repo_name):
-        """ Получить id репозитория.
+    async def is_alive(self, timeout=5):
+        """ Проверить, что пул подключен и БД отвечает (перед повторным использованием пула).
 
-            :param repo_name: Полное название репозитория ("{owner}/{repo_name}").
+        :param timeout: Максимальное время проверки, сек.
         """
+        if self.pool is None or self.pool.is_closing():
+            return False
         try:
-            return await self.execute(
-                "SELECT id FROM top_repos WHERE repo=$1", repo_name
-            )
-        except asyncpg.PostgresError as e:
-            logging.error(f"Error getting repo ID: {e}")
-            raise
+            async with self.pool.acquire(timeout=timeout) as conn:
+                await conn.fetchval("SELECT 1", timeout=timeout)
+            return True
+        except Exception as e:
+            logging.warning(f"PostgreSQL connection pool is not usable: {e!r}")
+            return False
+
+    def terminate(self):
+        """ Закрыть все соединения пула без ожидания (соединения могли быть разорваны). """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
 
-    async def get_last_activity_date(self, repo_id):
-        """ Получить дату последнего действия в репозитории из БД.
+    async def get_commit_watermarks(self, repo_names):
+        """ Получить отметки загруженной истории коммитов репозиториев из БД одним запросом.
 
-            :param repo_id: ID репозитория из БД.
+            :param repo_names: Полные названия репозиториев ("{owner}/{repo_name}").
+            :return: Словарь {repo: (дата новейшего коммита, [sha коммитов с этой датой])}, репозитории
+                без отметки отсутствуют.
         """
         try:
             result = await self.execute(
                 """
-                    SELECT MAX(date) AS last_activity_date
-                    FROM repo_activity
-                    WHERE repo_id=$1
-                """, repo_id
+                    SELECT r.repo, w.committed_at, w.shas
+                    FROM top_repos r
+                    JOIN repo_commit_watermarks w ON w.repo_id = r.id
+                    WHERE r.repo = ANY($1::text[])
+                """, list(repo_names)
             )
-            if result and result[0]['last_activity_date']:
-                return result[0]['last_activity_date']
-            return None
+            return {row['repo']: (row['committed_at'], row['shas']) for row in result}
         except asyncpg.PostgresError as e:
-            logging.error(f"Error getting repo last activity date: {e}")
+            logging.error(f"Error getting repos commit watermarks: {e}")
             raise
 
-    async def insert_repo(self, repo_data):
-        """ Вставить данные репозитория в БД.
+    async def get_unfinished_run(self, max_age_hours):
+        """ Получить контрольную точку последнего незавершенного запуска парсера.
 
-            :param repo_data : (models.Repo) Данные репозитория.
+            :param max_age_hours: Запуски, начатые раньше, не продолжаются.
+            :return: (запись parser_runs, записи parser_run_repos) или None.
         """
         try:
-            await self.execute(
+            run = await self.execute(
                 """
-                    INSERT INTO top_repos (repo, owner, position_cur, stars, watchers, forks, open_issues, language, snapshot_date)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CURRENT_DATE - 1)
+                    SELECT id, started_at, repos FROM parser_runs
+                    WHERE finished_at IS NULL AND started_at > now() - make_interval(hours => $1)
+                    ORDER BY started_at DESC
+                    LIMIT 1
+                """, max_age_hours
+            )
+            if not run:
+                return None
+            rows = await self.execute(
+                """
+                    SELECT repo, status, since, since_shas, cursor, pages, partial, newest_at, newest_shas
+                    FROM parser_run_repos
+                    WHERE run_id = $1
                 """,
-                repo_data['repo'],  # 1
-                repo_data['owner'],         # 2
-                repo_data['position_cur'],  # 3
-                repo_data['stars'],         # 4
-                repo_data['watchers'],      # 5
-                repo_data['forks'],         # 6
-                repo_data['open_issues'],   # 7
-                repo_data['language']       # 8
+                run[0]['id']
             )
-            logging.info(f"Inserted repo: {repo_data['repo']}")
+            return run[0], rows
         except asyncpg.PostgresError as e:
-            logging.error(f"Error inserting repo ({repo_data.model_json()}): {e}")
+            logging.error(f"Error getting unfinished parser run: {e}")
             raise
 
-    async def update_repo(self, repo_id, repo_data):
-        """ Обновить данные репозитория.
+    async def ensure_activity_partitions(self, activities):
+        """ Создать месячные секции repo_activity для периода активности в отдельной короткой транзакции.
 
-            :param repo_id : ID репозитория.
-            :param repo_data : (models.Repo) Данные репозитория.
+            Вызывается перед записью активности (save_snapshot, replace_repo_activity): подключение секции
+            блокирует repo_activity_default, и в транзакции записи эта блокировка держалась бы до ее конца, не давая
+            API читать repo_activity. Без вызова активность вне существующих секций попадает в секцию по умолчанию.
+
+            :param activities: Словарь {repo: [models.Activity]} с активностью репозиториев.
         """
+        dates = [activity['date'] for repo_activities in activities.values() for activity in repo_activities]
+        if not dates:
+            return
         try:
-            await self.execute(
-                """
-                    UPDATE top_repos
-                    SET position_cur = $1,
-                        stars = $2,
-                        watchers = $3,
-                        forks = $4,
-                        open_issues = $5,
-                        language = $6,
-                        snapshot_date = CURRENT_DATE - 1
-                    WHERE id = $7
-                """,
-                repo_data['position_cur'],  # 1
-                repo_data['stars'],                 # 2
-                repo_data['watchers'],              # 3
-                repo_data['forks'],                 # 4
-                repo_data['open_issues'],           # 5
-                repo_data['language'],              # 6
-                repo_id                             # 7
-            )
-            logging.info(f"Updated repo: {repo_data['repo']}")
+            async with self.pool.acquire() as conn:
+                await conn.execute("SELECT ensure_repo_activity_partitions($1, $2)", min(dates), max(dates))
+        except asyncpg.PostgresError as e:
+            logging.error(f"Error creating repo_activity partitions: {e}")
+            raise
+
+    async def save_snapshot(self, repos, activities, checkpoint=None, watermarks=None):
+        """ Записать снимок топа, активность репозиториев, отметки их истории и контрольную точку запуска
+            в одной транзакции.
+
+            Репозитории записываются одним INSERT ... ON CONFLICT (repo) и копируются в историю топа
+            (top_repos_history). Имена авторов заменяются id из словаря authors (новые имена добавляются
+            одним запросом). Активность - только коммиты после отметки истории репозитория - загружается
+            через COPY во временную таблицу и добавляется к строкам repo_activity по (repo_id, date): кол-во
+            коммитов складывается, id авторов объединяются. Затем пересчитываются недельные и месячные сводки
+            затронутых периодов. Отметки сдвигаются в той же транзакции, поэтому повторный запуск не учитывает
+            коммиты дважды. Активность и отметки записываются под блокировкой истории репозиториев
+            (см. _lock_repo_history), поэтому не пересекаются с заменой активности (replace_repo_activity).
+            Если что-то записано, версия данных увеличивается (см. _bump_data_version), после фиксации
+            транзакции в канал TOP_REPOS_SNAPSHOT_CHANNEL отправляется уведомление с новой версией.
+
+            :param repos: Список данных репозиториев (models.Repo.dict()), пустой - снимок топа уже записан.
+            :param activities: Словарь {repo: [models.Activity]} с активностью репозиториев.
+            :param checkpoint: Контрольная точка запуска (checkpoint.RunCheckpoint), новому запуску
+                присваивается run_id.
+            :param watermarks: Словарь {repo: (дата новейшего коммита, [sha])} с новыми отметками истории.
+        """
+        activity_count = sum(len(repo_activities) for repo_activities in activities.values())
+        new_author_ids = {}
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if repos:
+                        await self._save_top_repos(conn, repos)
+                    if activity_count or watermarks:
+                        await self._lock_repo_history(conn, {*activities, *(watermarks or {})})
+                    if activity_count:
+                        records, new_author_ids = await self._activity_records(conn, activities)
+                        await self._save_activity(conn, records)
+                    if watermarks:
+                        await self._save_watermarks(conn, watermarks)
+                    if repos or activity_count or watermarks:
+                        await self._bump_data_version(conn)
+                    if checkpoint is not None:
+                        await self._save_checkpoint(conn, checkpoint)
+            # Id новых авторов запоминаются только после фиксации транзакции, в которой они добавлены
+            self.author_ids.update(new_author_ids)
+            logging.info(f"Saved snapshot: {len(repos)} repos, {activity_count} activity rows")
         except asyncpg.PostgresError as e:
-            logging.error(f"Error updating repo (ID: {repo_id}): {e}")
+            logging.error(f"Error saving snapshot: {e}")
             raise
 
-    async def insert_repo_activity(self, repo_id, activity_data):
-        """ Вставить данные активности репозитория.
+    @staticmethod
+    async def _save_top_repos(conn, repos):
+        """ Записать снимок топа и копию в историю топа. """
+        await conn.execute(
+            """
+                INSERT INTO top_repos (repo, owner, position_cur, stars, watchers, forks, open_issues,
+                                       language, snapshot_date)
+                SELECT repo, owner, position_cur, stars, watchers, forks, open_issues, language,
+                       CURRENT_DATE - 1
+                FROM unnest($1::text[], $2::text[], $3::int[], $4::int[], $5::int[], $6::int[],
+                            $7::int[], $8::text[])
+                    AS t(repo, owner, position_cur, stars, watchers, forks, open_issues, language)
+                ON CONFLICT (repo) DO UPDATE
+                SET position_cur = EXCLUDED.position_cur,
+                    stars = EXCLUDED.stars,
+                    watchers = EXCLUDED.watchers,
+                    forks = EXCLUDED.forks,
+                    open_issues = EXCLUDED.open_issues,
+                    language = EXCLUDED.language,
+                    snapshot_date = EXCLUDED.snapshot_date
+            """,
+            [repo['repo'] for repo in repos],           # 1
+            [repo['owner'] for repo in repos],          # 2
+            [repo['position_cur'] for repo in repos],   # 3
+            [repo['stars'] for repo in repos],          # 4
+            [repo['watchers'] for repo in repos],       # 5
+            [repo['forks'] for repo in repos],          # 6
+            [repo['open_issues'] for repo in repos],    # 7
+            [repo['language'] for repo in repos]        # 8
+        )
 
-            :param repo_id : ID репозитория.
-            :param activity_data : (models.Activity) Данные активности репозитория.
+        # Тот же снимок добавляется в историю топа
+        await conn.execute(
+            """
+                INSERT INTO top_repos_history (repo_id, snapshot_date, position, stars, watchers, forks,
+                                               open_issues, language)
+                SELECT id, snapshot_date, position_cur, stars, watchers, forks, open_issues, language
+                FROM top_repos
+                WHERE repo = ANY($1::text[])
+                ON CONFLICT (repo_id, snapshot_date) DO UPDATE
+                SET position = EXCLUDED.position,
+                    stars = EXCLUDED.stars,
+                    watchers = EXCLUDED.watchers,
+                    forks = EXCLUDED.forks,
+                    open_issues = EXCLUDED.open_issues,
+                    language = EXCLUDED.language
+            """,
+            [repo['repo'] for repo in repos]
+        )
+
+    @staticmethod
+    async def _bump_data_version(conn):
+        """ Увеличить версию данных (из нее API строит ETag ответов) и уведомить подписчиков (API) о записи.
+        Уведомление доставляется только после фиксации транзакции. """
+        await conn.execute(
+            """
+                WITH bumped AS (
+                    UPDATE data_version SET version = version + 1, updated_at = now()
+                    RETURNING version
+                )
+                SELECT pg_notify($1, version::text) FROM bumped
+            """, TOP_REPOS_SNAPSHOT_CHANNEL
+        )
+
+    async def replace_repo_activity(self, repo, activities, watermark, expected_watermark):
+        """ Заменить всю активность репозитория (и ее сводки) активностью, собранной заново (см. backfill.py),
+            в одной транзакции.
+
+            Замена выполняется, только если отметка истории репозитория не изменилась с начала сбора: иначе
+            парсер успел добавить коммиты, которых нет в собранной активности. Отметка читается после
+            блокировки истории репозитория (см. _lock_repo_history), которую до конца транзакции ждет и запись
+            парсера (save_snapshot), поэтому его коммиты не могут быть записаны между проверкой и заменой.
+            Секции repo_activity для активности создаются заранее (ensure_activity_partitions).
+
+            :param repo: Полное название репозитория.
+            :param activities: Список данных активности (models.Activity) всей истории до отметки.
+            :param watermark: (дата новейшего коммита, [sha]) - отметка после замены (не сдвигается назад) или None.
+            :param expected_watermark: (дата, [sha]) - отметка в БД на начало сбора, None - отметки не было.
+            :return: True, если активность заменена, False - если отметка изменилась или репозитория нет в топе.
         """
+        new_author_ids = {}
         try:
-            await self.execute(
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    repo_id = await conn.fetchval("SELECT id FROM top_repos WHERE repo = $1", repo)
+                    if repo_id is None:
+                        logging.warning(f"Repo {repo} is not tracked, activity is not replaced")
+                        return False
+                    await self._lock_repo_history(conn, [repo])
+                    row = await conn.fetchrow(
+                        "SELECT committed_at, shas FROM repo_commit_watermarks WHERE repo_id = $1", repo_id
+                    )
+                    current = (row['committed_at'], sorted(row['shas'])) if row else None
+                    expected = (expected_watermark[0], sorted(expected_watermark[1])) if expected_watermark \
+                        else None
+                    if current != expected:
+                        logging.warning(f"Commit watermark of {repo} changed, activity is not replaced")
+                        return False
+
+                    for table in ('repo_activity', *(table for table, _ in ACTIVITY_ROLLUPS)):
+                        await conn.execute(f"DELETE FROM {table} WHERE repo_id = $1", repo_id)
+                    if activities:
+                        records, new_author_ids = await self._activity_records(conn, {repo: activities})
+                        await self._save_activity(conn, records)
+                    if watermark is not None:
+                        await self._save_watermarks(conn, {repo: watermark})
+                    await self._bump_data_version(conn)
+            self.author_ids.update(new_author_ids)
+            logging.info(f"Replaced activity of {repo}: {len(activities)} activity rows")
+            return True
+        except asyncpg.PostgresError as e:
+            logging.error(f"Error replacing activity of {repo}: {e}")
+            raise
+
+    @staticmethod
+    async def _lock_repo_history(conn, repos):
+        """ Заблокировать до конца транзакции историю репозиториев (advisory lock REPO_HISTORY_LOCK по id).
+        Блокировки берутся в порядке id, чтобы одновременные транзакции не ждали друг друга по кругу. """
+        await conn.execute(
+            """
+                SELECT pg_advisory_xact_lock($1, t.id)
+                FROM (SELECT id FROM top_repos WHERE repo = ANY($2::text[]) ORDER BY id) t
+            """, REPO_HISTORY_LOCK, list(repos)
+        )
+
+    async def _activity_records(self, conn, activities):
+        """ Записи активности для COPY с id авторов вместо имен (новые имена добавляются в словарь authors).
+
+        :param activities: Словарь {repo: [models.Activity]}
+        :return: ([(repo, date, commits, [author_id])], {имя: id} добавленных авторов)"""
+        new_author_ids = await self._intern_authors(conn, {
+            author for repo_activities in activities.values()
+            for activity in repo_activities for author in activity['authors']
+        })
+        author_ids = {**self.author_ids, **new_author_ids}
+        records = [
+            (repo, activity['date'], activity['commits'], sorted(author_ids[author] for author in activity['authors']))
+            for repo, repo_activities in activities.items()
+            for activity in repo_activities
+        ]
+        return records, new_author_ids
+
+    async def _intern_authors(self, conn, names):
+        """ Добавить в словарь authors имена, которых еще нет в self.author_ids, одним запросом.
+
+        ON CONFLICT DO UPDATE возвращает id и уже существующих имен, в том числе добавленных одновременной
+        транзакцией во время запроса (их не видит снимок запроса). Имена упорядочены, чтобы одновременные
+        транзакции блокировали строки авторов в одном порядке.
+
+        :return: Словарь {имя: id} запрошенных имен"""
+        missing = sorted(name for name in names if name not in self.author_ids)
+        if not missing:
+            return {}
+        rows = await conn.fetch(
+            """
+                INSERT INTO authors (name)
+                SELECT unnest($1::text[])
+                ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+                RETURNING id, name
+            """, missing
+        )
+        return {row['name']: row['id'] for row in rows}
+
+    @staticmethod
+    async def _save_activity(conn, activity_records):
+        """ Добавить активность к repo_activity через временную таблицу и пересчитать сводки затронутых периодов. """
+        await conn.execute(
+            """
+                CREATE TEMP TABLE repo_activity_staging (
+                    repo TEXT NOT NULL,
+                    date DATE NOT NULL,
+                    commits INTEGER NOT NULL,
+                    author_ids INTEGER[] NOT NULL
+                ) ON COMMIT DROP
+            """
+        )
+        await conn.copy_records_to_table(
+            'repo_activity_staging', records=activity_records, columns=['repo', 'date', 'commits', 'author_ids']
+        )
+        await conn.execute(
+            """
+                INSERT INTO repo_activity (repo_id, date, commits, author_ids)
+                SELECT r.id, s.date, s.commits, s.author_ids
+                FROM repo_activity_staging s
+                JOIN top_repos r ON r.repo = s.repo
+                ON CONFLICT (repo_id, date) DO UPDATE
+                SET commits = repo_activity.commits + EXCLUDED.commits,
+                    author_ids = ARRAY(
+                        SELECT DISTINCT author_id
+                        FROM unnest(repo_activity.author_ids || EXCLUDED.author_ids) AS author_id
+                        ORDER BY 1
+                    )
+            """
+        )
+
+        # Пересчитывает недельные и месячные сводки периодов, затронутых записанной активностью
+        for table, unit in ACTIVITY_ROLLUPS:
+            await conn.execute(
+                f"""
+                    WITH periods AS (
+                        SELECT DISTINCT r.id AS repo_id,
+                               date_trunc('{unit}', s.date)::date AS period_start
+                        FROM repo_activity_staging s
+                        JOIN top_repos r ON r.repo = s.repo
+                    )
+                    INSERT INTO {table} (repo_id, period_start, commits, authors_count)
+                    SELECT p.repo_id, p.period_start, c.commits, u.authors_count
+                    FROM periods p
+                    CROSS JOIN LATERAL (
+                        SELECT COALESCE(SUM(a.commits), 0) AS commits
+                        FROM repo_activity a
+                        WHERE a.repo_id = p.repo_id AND a.date >= p.period_start
+                          AND a.date < p.period_start + interval '1 {unit}'
+                    ) c
+                    CROSS JOIN LATERAL (
+                        SELECT COUNT(DISTINCT author) AS authors_count
+                        FROM repo_activity a, unnest(a.author_ids) AS author
+                        WHERE a.repo_id = p.repo_id AND a.date >= p.period_start
+                          AND a.date < p.period_start + interval '1 {unit}'
+                    ) u
+                    ON CONFLICT (repo_id, period_start) DO UPDATE
+                    SET commits = EXCLUDED.commits,
+                        authors_count = EXCLUDED.authors_count
                 """
-                    INSERT INTO repo_activity (repo_id, date, commits, authors)
-                    VALUES ($1, $2, $3, $4)
-                """,
-                repo_id,
-                activity_data['date'],
-                activity_data['commits'],
-                list(activity_data['authors'])
             )
 
+    @staticmethod
+    async def _save_watermarks(conn, watermarks):
+        """ Сдвинуть отметки истории коммитов репозиториев (отметка не сдвигается назад). """
+        await conn.execute(
+            """
+                INSERT INTO repo_commit_watermarks (repo_id, committed_at, shas, updated_at)
+                SELECT r.id, t.committed_at, string_to_array(t.shas, ','), now()
+                FROM unnest($1::text[], $2::timestamptz[], $3::text[]) AS t(repo, committed_at, shas)
+                JOIN top_repos r ON r.repo = t.repo
+                ON CONFLICT (repo_id) DO UPDATE
+                SET committed_at = EXCLUDED.committed_at,
+                    shas = EXCLUDED.shas,
+                    updated_at = EXCLUDED.updated_at
+                WHERE repo_commit_watermarks.committed_at <= EXCLUDED.committed_at
+            """,
+            list(watermarks),
+            [committed_at for committed_at, _ in watermarks.values()],
+            [','.join(shas) for _, shas in watermarks.values()]
+        )
+
+    @staticmethod
+    async def _save_checkpoint(conn, checkpoint):
+        """ Записать контрольную точку запуска: новый запуск получает run_id, состояние репозиториев
+        перезаписывается, завершенный запуск отмечается finished_at. """
+        if checkpoint.run_id is None:
+            checkpoint.run_id = await conn.fetchval(
+                "INSERT INTO parser_runs (started_at, repos) VALUES ($1, $2::jsonb) RETURNING id",
+                checkpoint.started_at, json.dumps([repo.dict() for repo in checkpoint.repos])
+            )
+        await conn.execute(
+            """
+                UPDATE parser_runs
+                SET updated_at = now(),
+                    finished_at = CASE WHEN $2 THEN now() END
+                WHERE id = $1
+            """, checkpoint.run_id, checkpoint.finished
+        )
+        # Состояние всех репозиториев одним запросом: в топе может быть до десятков тысяч репозиториев
+        records = checkpoint.records()
+        await conn.execute(
+            """
+                INSERT INTO parser_run_repos (run_id, repo, status, since, since_shas, cursor, pages, partial,
+                                              newest_at, newest_shas)
+                SELECT $1, repo, status, since, string_to_array(since_shas, ','), cursor, pages, partial::jsonb,
+                       newest_at, string_to_array(newest_shas, ',')
+                FROM unnest($2::text[], $3::text[], $4::timestamptz[], $5::text[], $6::text[], $7::int[],
+                            $8::text[], $9::timestamptz[], $10::text[])
+                    AS t(repo, status, since, since_shas, cursor, pages, partial, newest_at, newest_shas)
+                ON CONFLICT (run_id, repo) DO UPDATE
+                SET status = EXCLUDED.status,
+                    since = EXCLUDED.since,
+                    since_shas = EXCLUDED.since_shas,
+                    cursor = EXCLUDED.cursor,
+                    pages = EXCLUDED.pages,
+                    partial = EXCLUDED.partial,
+                    newest_at = EXCLUDED.newest_at,
+                    newest_shas = EXCLUDED.newest_shas
+            """,
+            checkpoint.run_id,
+            # Списки SHA передаются строками через запятую: unnest не разворачивает массивы массивов
+            *([','.join(value) if i in (3, 8) and value is not None else value for value in column]
+              for i, column in enumerate(zip(*records)))
+        )
+
+    async def get_http_cache_validators(self):
+        """ Получить валидаторы всех записей кэша ответов GitHub API.
+
+            :return: Словарь {key: (etag, last_modified)}.
+        """
+        try:
+            result = await self.execute("SELECT key, etag, last_modified FROM http_cache")
+            return {row['key']: (row['etag'], row['last_modified']) for row in result}
         except asyncpg.PostgresError as e:
-            logging.error(f"Error inserting repo activity (ID: {repo_id}): {e}")
-            raise
\ No newline at end of file
+            logging.error(f"Error getting HTTP cache validators: {e}")
+            raise
+
+    async def get_http_cache_entry(self, key):
+        """ Получить сохраненный ответ GitHub API.
+
+            :param key: Ключ кэша (URL с параметрами).
+            :return: Запись с полями payload и link или None.
+        """
+        try:
+            result = await self.execute("SELECT payload, link FROM http_cache WHERE key = $1", key)
+            return result[0] if result else None
+        except asyncpg.PostgresError as e:
+            logging.error(f"Error getting HTTP cache entry ({key}): {e}")
+            raise
+
+    async def save_http_cache(self, entries, hit_keys, max_entries):
+        """ Сохранить новые ответы в кэш, обновить время обращения и вытеснить лишние записи.
+
+            :param entries: Список (key, etag, last_modified, payload, link) новых ответов.
+            :param hit_keys: Ключи записей, использованных в этом запуске.
+            :param max_entries: Максимальное кол-во записей, давно не использованные записи сверх него удаляются.
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if entries:
+                        await conn.executemany(
+                            """
+                                INSERT INTO http_cache (key, etag, last_modified, payload, link, accessed_at)
+                                VALUES ($1, $2, $3, $4::jsonb, $5, now())
+                                ON CONFLICT (key) DO UPDATE
+                                SET etag = EXCLUDED.etag,
+                                    last_modified = EXCLUDED.last_modified,
+                                    payload = EXCLUDED.payload,
+                                    link = EXCLUDED.link,
+                                    accessed_at = EXCLUDED.accessed_at
+                            """, entries
+                        )
+                    if hit_keys:
+                        await conn.execute(
+                            "UPDATE http_cache SET accessed_at = now() WHERE key = ANY($1::text[])", hit_keys
+                        )
+                    await conn.execute(
+                        """
+                            DELETE FROM http_cache
+                            WHERE key IN (SELECT key FROM http_cache ORDER BY accessed_at DESC OFFSET $1)
+                        """, max_entries
+                    )
+        except asyncpg.PostgresError as e:
+            logging.error(f"Error saving HTTP cache: {e}")
+            raise
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+from metrics import RunMetrics
+
+
+# Ресурс лимита запросов GitHub API по виду запроса (остальные запросы расходуют core)
+RATE_LIMIT_RESOURCES = {'search': 'search', 'graphql': 'graphql'}
+
+# Минимальное ожидание при вторичном лимите без заголовка Retry-After (по документации GitHub - минута)
+SECONDARY_RATE_LIMIT_SECONDS = 60
+
+# Статусы временных ошибок GitHub, запрос повторяется с экспоненциальной задержкой
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class RateLimitError(Exception):
+    """ Лимит запросов всех токенов исчерпан, а до его восстановления дольше, чем допустимо ждать. """
+
+
+class TokenBudget:
+    """ Остаток лимита запросов одного токена по одному ресурсу GitHub API. """
+
+    def __init__(self):
+        self.limit = None           # Лимит из X-RateLimit-Limit (None - неизвестен)
+        self.remaining = None       # Остаток из X-RateLimit-Remaining (None - неизвестен)
+        self.reset = 0.0            # Время восстановления лимита из X-RateLimit-Reset (unix time)
+        self.blocked_until = 0.0    # Токен не используется до этого времени (вторичный лимит, unix time)
+        self.in_flight = 0          # Кол-во выполняющихся запросов
+
+    def available(self, now):
+        """ Сколько еще запросов можно отправить с токеном (inf - ответов с заголовками лимита еще не было).
+        Запросы в работе уже вычтены, поэтому после восстановления лимита ожидающие запросы не превышают его. """
+        if self.remaining is None:
+            return float('inf')
+        if self.reset <= now:
+            return (self.limit or float('inf')) - self.in_flight
+        return self.remaining - self.in_flight
+
+
+class GithubClient:
+    """ Клиент GitHub API с пулом токенов.
+
+    Остаток лимита каждого токена отслеживается по заголовкам X-RateLimit-* ответов отдельно для ресурсов
+    core, search и graphql. Каждый запрос отправляется с токеном с наибольшим остатком, поэтому общий лимит
+    запуска растет пропорционально кол-ву токенов. Ответы о превышении лимита (403/429) и временные ошибки
+    (5xx) не прерывают запуск: токен откладывается до восстановления лимита или на время Retry-After,
+    запрос повторяется с другим токеном или после ожидания. """
+
+    def __init__(self, session: aiohttp.ClientSession, tokens, metrics: RunMetrics, max_retries: int,
+                 backoff: float, max_wait: float, deadline=None):
+        """
+        :param session: aiohttp.ClientSession
+        :param tokens: Токены авторизации GitHub (пустой список - запросы без авторизации)
+        :param metrics: Метрики запуска
+        :param max_retries: Максимальное кол-во повторов одного запроса
+        :param backoff: Начальная задержка повтора после временной ошибки, сек. (удваивается с каждым повтором)
+        :param max_wait: Максимальное ожидание восстановления лимита, сек. (дольше - RateLimitError)
+        :param deadline: Момент (time.monotonic), после которого ожидание лимита бессмысленно
+        """
+        self.session = session
+        self.tokens = list(tokens) or [None]
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.deadline = deadline
+        self._budgets = {}
+
+    def _budget(self, index, resource) -> TokenBudget:
+        budget = self._budgets.get((index, resource))
+        if budget is None:
+            budget = self._budgets[(index, resource)] = TokenBudget()
+        return budget
+
+    def _pick_token(self, resource):
+        """ Выбирает токен с наибольшим остатком лимита (при равенстве - с наименьшим кол-вом запросов в работе).
+
+        :return: (номер токена или None, если доступных нет; через сколько секунд появится доступный)"""
+        now = time.time()
+        best, best_score, wait = None, None, float('inf')
+        for index in range(len(self.tokens)):
+            budget = self._budget(index, resource)
+            if budget.blocked_until > now:
+                wait = min(wait, budget.blocked_until - now)
+                continue
+            available = budget.available(now)
+            if available <= 0:
+                wait = min(wait, budget.reset - now)
+                continue
+            score = (available, -budget.in_flight)
+            if best_score is None or score > best_score:
+                best, best_score = index, score
+        return best, wait
+
+    def _update_budget(self, index, resource, response):
+        """ Обновляет остаток лимита токена по заголовкам ответа. """
+        limit = response.headers.get('X-RateLimit-Limit')
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        # Ресурс ответа может отличаться от ожидаемого (например, запрос к core через другой endpoint)
+        budget = self._budget(index, response.headers.get('X-RateLimit-Resource', resource))
+        if limit is not None:
+            budget.limit = int(limit)
+        if remaining is not None:
+            budget.remaining = int(remaining)
+            self.metrics.set(f'github_token_remaining.{resource}.{index}', int(remaining))
+        if reset is not None:
+            budget.reset = float(reset)
+        return budget
+
+    async def _retry_delay(self, response, budget: TokenBudget, attempt):
+        """ Определяет, нужно ли повторить запрос.
+
+        :return: (задержка перед повтором в секундах или None - ответ окончательный, ответ о превышении лимита,
+            считается ли повтор в max_retries)"""
+        if response.status in (403, 429):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                # Вторичный лимит: токен откладывается на указанное время, запрос уходит с другим токеном
+                budget.blocked_until = time.time() + float(retry_after)
+                return 0, True, True
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                # Первичный лимит: токен не используется до X-RateLimit-Reset. Такой повтор не считается -
+                # ожидание восстановления лимита ограничено max_wait
+                budget.remaining = 0
+                budget.reset = max(budget.reset, time.time() + 1)
+                return 0, True, False
+            if 'rate limit' in (await response.text()).lower():
+                # Вторичный лимит без Retry-After
+                budget.blocked_until = time.time() + SECONDARY_RATE_LIMIT_SECONDS * 2 ** attempt
+                return 0, True, True
+        if response.status in RETRY_STATUSES:
+            return self.backoff * 2 ** attempt * (1 + random.random() / 2), False, True
+        return None, False, False
+
+    async def _wait(self, seconds, reason):
+        """ Ждет восстановления лимита или отказывает, если ждать слишком долго. """
+        if seconds > self.max_wait or (self.deadline is not None and time.monotonic() + seconds > self.deadline):
+            raise RateLimitError(f"GitHub {reason} rate limit exhausted for all {len(self.tokens)} tokens, "
+                                 f"next token available in {seconds:.0f}s")
+        logging.warning(f"GitHub {reason} rate limit exhausted for all tokens, waiting {seconds:.1f}s")
+        self.metrics.inc('github_ratelimit_wait_seconds', seconds)
+        await asyncio.sleep(seconds)
+
+    @asynccontextmanager
+    async def request(self, method, url, kind='rest', headers=None, **kwargs):
+        """ Выполняет запрос к GitHub API с выбором токена и повторами, возвращает окончательный ответ.
+
+        :param method: HTTP метод
+        :param url: URL запроса
+        :param kind: Вид запроса для метрик и выбора ресурса лимита (search, graphql, остальные - core)
+        :param headers: Дополнительные заголовки запроса
+        :param kwargs: Остальные параметры aiohttp.ClientSession.request (params, json)"""
+        resource = RATE_LIMIT_RESOURCES.get(kind, 'core')
+        attempt = 0
+        while True:
+            index, wait = self._pick_token(resource)
+            if index is None:
+                await self._wait(wait, resource)
+                continue
+
+            token = self.tokens[index]
+            request_headers = {**(headers or {}), **({'Authorization': f"token {token}"} if token else {})}
+            budget = self._budget(index, resource)
+            budget.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self.session.request(method, url, headers=request_headers, **kwargs)
+            finally:
+                budget.in_flight -= 1
+            self.metrics.observe_github_response(kind, time.perf_counter() - started, response)
+            budget = self._update_budget(index, resource, response)
+
+            delay, rate_limited, counted = await self._retry_delay(response, budget, attempt)
+            if delay is None or attempt >= self.max_retries:
+                if rate_limited:
+                    response.release()
+                    raise RateLimitError(f"GitHub {resource} rate limit: {attempt + 1} attempts failed ({url})")
+                try:
+                    yield response
+                finally:
+                    response.release()
+                return
+
+            response.release()
+            attempt += counted
+            self.metrics.inc(f'github_retries.{kind}')
+            logging.warning(f"GitHub {kind} request returned {response.status}, retry {attempt} ({url})")
+            if delay:
+                await asyncio.sleep(delay)
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import time
+
+from aggregation import add_commits_after
+from checkpoint import PENDING, DONE, FAILED
+from github_client import GithubClient, RateLimitError
+from models import Repo
+from parser import GithubParser
+from settings import GITHUB_GRAPHQL_ENDPOINT, GRAPHQL_BATCH_SIZE, COMMITS_PER_PAGE, COMMITS_MAX_PAGES, \
+    COMMITS_MAX_SECONDS
+from top_search import SEARCH_PER_PAGE
+
+
+# Запрос топа репозиториев по звездам вместе со всеми полями models.Repo
+TOP_REPOS_QUERY = """
+query($query: String!, $first: Int!) {
+  search(query: $query, type: REPOSITORY, first: $first) {
+    nodes {
+      ... on Repository {
+        nameWithOwner
+        owner { login }
+        stargazerCount
+        forkCount
+        issues(states: OPEN) { totalCount }
+        pullRequests(states: OPEN) { totalCount }
+        primaryLanguage { name }
+      }
+    }
+  }
+  rateLimit { cost remaining resetAt }
+}
+"""
+
+# История коммитов одного репозитория внутри пакетного запроса, {i} - номер репозитория в пакете
+HISTORY_ALIAS = """
+  r{i}: repository(owner: $owner{i}, name: $name{i}) {{
+    defaultBranchRef {{
+      target {{
+        ... on Commit {{
+          history(first: {first}, since: $since{i}, until: $until{i}, after: $after{i}) {{
+            pageInfo {{ hasNextPage endCursor }}
+            nodes {{ oid committedDate author {{ name date }} }}
+          }}
+        }}
+      }}
+    }}
+  }}"""
+
+
+def build_history_query(size):
+    """ Собирает запрос истории коммитов для пакета из size репозиториев (псевдонимы r0..r{size-1}).
+
+    :param size: Кол-во репозиториев в пакете"""
+    variables = ", ".join(
+        f"$owner{i}: String!, $name{i}: String!, $since{i}: GitTimestamp, $until{i}: GitTimestamp, $after{i}: String"
+        for i in range(size)
+    )
+    aliases = "".join(HISTORY_ALIAS.format(i=i, first=COMMITS_PER_PAGE) for i in range(size))
+    return f"query({variables}) {{{aliases}\n  rateLimit {{ cost remaining resetAt }}\n}}"
+
+
+class GraphQLGithubParser(GithubParser):
+    """ Парсер, получающий топ репозиториев и историю коммитов через GitHub GraphQL API.
+
+    Топ запрашивается одним запросом, история коммитов - пакетами по GRAPHQL_BATCH_SIZE репозиториев
+    в одном запросе с псевдонимами. Репозитории, у которых есть следующие страницы истории, переходят
+    в следующий раунд со своими курсорами. """
+
+    async def _get_top_repos(self, client: GithubClient):
+        """ Запрашивает данные топ репозиториев из GitHub. Топ больше одной страницы GraphQL поиска собирается
+        шардами REST поиска (страницы GraphQL поиска идут по курсорам и не запрашиваются параллельно). """
+        if self.top_count > SEARCH_PER_PAGE:
+            return await super()._get_top_repos(client)
+        data = await self._graphql(client, TOP_REPOS_QUERY, {'query': "stars:>1 sort:stars-desc",
+                                                             'first': self.top_count})
+        return [self._build_graphql_repo(i + 1, node) for i, node in enumerate(data['search']['nodes'])]
+
+    @staticmethod
+    def _build_graphql_repo(position, node) -> Repo:
+        """ Собирает модель репозитория из ответа GraphQL API. Значения совпадают с REST API:
+        watchers - количество звезд, open_issues - открытые issue вместе с pull request.
+
+        :param position: Позиция в топе (начиная с 1)
+        :param node: Данные репозитория из GitHub"""
+        language = node['primaryLanguage']
+        return Repo(
+            repo=node['nameWithOwner'],
+            owner=node['owner']['login'],
+            position_cur=position,
+            position_prev=None,
+            stars=node['stargazerCount'],
+            watchers=node['stargazerCount'],
+            forks=node['forkCount'],
+            open_issues=node['issues']['totalCount'] + node['pullRequests']['totalCount'],
+            language=language['name'] if language else None
+        )
+
+    async def _process_repos(self, client: GithubClient, repos: list[Repo]):
+        """ Собирает активность репозиториев пакетными запросами истории коммитов
+
+        :param client: GithubClient
+        :param repos: Репозитории топа
+        :return: Активность завершенных репозиториев {repo: [activity]}, время выполнения каждого запроса
+            и список репозиториев, обработка которых завершилась ошибкой"""
+        await self._fix_watermarks(repos)
+
+        # Состояние пагинации каждого репозитория (курсор, кол-во страниц и агрегация по дням)
+        # хранится в контрольной точке запуска
+        progress = self.checkpoint.progress
+        pending = [repo.repo for repo in repos]
+
+        latencies = []
+        semaphore = asyncio.Semaphore(self.concurrency)
+        deadline = self._repo_deadline()
+        while pending:
+            batches = [pending[i:i + GRAPHQL_BATCH_SIZE] for i in range(0, len(pending), GRAPHQL_BATCH_SIZE)]
+            results = await asyncio.gather(*(self._query_history(client, semaphore, batch) for batch in batches),
+                                           return_exceptions=True)
+
+            pages, rate_limited = {}, False
+            for batch, result in zip(batches, results):
+                if isinstance(result, RateLimitError):
+                    # Состояние репозиториев пакета не меняется, они продолжаются следующим вызовом
+                    logging.warning(f"Commit history of {len(batch)} repos postponed: {result}")
+                    rate_limited = True
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+                histories, latency = result
+                latencies.append(latency)
+                for name, history in zip(batch, histories or [None] * len(batch)):
+                    state = progress[name]
+                    if history is None:
+                        state.status = FAILED
+                        continue
+                    pages[name] = [{'sha': node['oid'], 'commit': {'author': node['author'],
+                                                                   'committer': {'date': node['committedDate']}}}
+                                   for node in history['nodes']]
+                    state.pages += 1
+                    page_info = history['pageInfo']
+                    if page_info['hasNextPage'] and state.pages < COMMITS_MAX_PAGES:
+                        state.cursor = page_info['endCursor']
+                        continue
+                    if page_info['hasNextPage']:
+                        logging.warning(f"Commit history of {name} truncated after {state.pages} pages")
+                    state.status = DONE
+                    state.cursor = None
+            # Страницы раунда сворачиваются в агрегации, коммиты до отметки истории репозитория пропускаются
+            for name, commits in pages.items():
+                state = progress[name]
+                add_commits_after(state.commits_by_date, commits, state.since, state.newest)
+            pending = [name for name in pending if progress[name].status == PENDING]
+
+            if pending and (self._deadline_passed() or rate_limited):
+                # Репозитории остаются в контрольной точке со своими курсорами до следующего вызова
+                logging.info(f"Commit history of {len(pending)} repos paused")
+                break
+            if pending and time.monotonic() >= deadline:
+                logging.warning(f"Commit history of {len(pending)} repos truncated after {COMMITS_MAX_SECONDS}s")
+                for name in pending:
+                    progress[name].status = DONE
+                    progress[name].cursor = None
+                break
+
+        activities, failed = self._collect_results(repos)
+        return activities, latencies, failed
+
+    async def _query_history(self, client: GithubClient, semaphore: asyncio.Semaphore, batch):
+        """ Запрашивает следующую страницу истории коммитов для пакета репозиториев.
+        Ошибка запроса не прерывает обработку остальных пакетов.
+
+        :param client: GithubClient
+        :param semaphore: Ограничитель кол-ва одновременных запросов
+        :param batch: Названия репозиториев пакета (их since и курсоры берутся из контрольной точки)
+        :return: (история каждого репозитория пакета (None - репозиторий недоступен) или None при ошибке запроса,
+            время выполнения запроса в секундах)"""
+        until = self.checkpoint.until.strftime("%Y-%m-%dT%H:%M:%SZ")
+        variables = {}
+        for i, repo in enumerate(batch):
+            owner, name = repo.split('/', 1)
+            state = self.checkpoint.progress[repo]
+            variables.update({f'owner{i}': owner, f'name{i}': name, f'until{i}': until,
+                              f'since{i}': state.since.committed_at,
+                              f'after{i}': state.cursor})
+
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                data = await self._graphql(client, build_history_query(len(batch)), variables)
+            except RateLimitError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to query commit history of {len(batch)} repos: {e}")
+                return None, time.perf_counter() - started
+            latency = time.perf_counter() - started
+
+        histories = []
+        for i in range(len(batch)):
+            repository = data.get(f'r{i}')
+            branch = repository and repository['defaultBranchRef']
+            if repository is not None and branch is None:
+                # Пустой репозиторий без веток - коммитов нет
+                histories.append({'nodes': [], 'pageInfo': {'hasNextPage': False, 'endCursor': None}})
+            else:
+                histories.append(branch['target']['history'] if branch else None)
+        logging.info(f"Queried commit history of {len(batch)} repos in {latency:.2f}s")
+        return histories, latency
+
+    async def _graphql(self, client: GithubClient, query, variables):
+        """ Выполняет запрос к GitHub GraphQL API.
+
+        Ошибки отдельных полей (например, недоступный репозиторий) логируются, поле в ответе при этом null.
+
+        :param client: GithubClient
+        :param query: Текст запроса
+        :param variables: Переменные запроса
+        :return: Поле data ответа"""
+        async with client.request('POST', GITHUB_GRAPHQL_ENDPOINT, 'graphql',
+                                  json={'query': query, 'variables': variables}) as response:
+            response.raise_for_status()
+            body = await response.json()
+
+        for error in body.get('errors') or []:
+            logging.warning(f"GraphQL error at {error.get('path')}: {error.get('message')}")
+        data = body.get('data')
+        if data is None:
+            raise RuntimeError(f"GraphQL query failed: {body.get('errors')}")
+        rate_limit = data.get('rateLimit')
+        if rate_limit:
+            self.metrics.inc('graphql_cost', rate_limit['cost'])
+            logging.info(f"GraphQL query cost {rate_limit['cost']}, remaining {rate_limit['remaining']}")
+        return data
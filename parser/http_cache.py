@@ -0,0 +1,109 @@
+import json
+import logging
+import re
+
+from yarl import URL
+
+from db.postgres import ParserPostgres
+
+
+# Ссылка заголовка Link: <https://api.github.com/...?page=2>; rel="next"
+LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
+
+
+def parse_link_header(link):
+    """ Разбирает заголовок Link в словарь {rel: {'url': URL}} (формат aiohttp.ClientResponse.links).
+
+    :param link: Значение заголовка Link или None"""
+    if not link:
+        return {}
+    return {rel: {'url': URL(url)} for url, rel in LINK_RE.findall(link)}
+
+
+class HttpCache:
+    """ Кэш валидаторов (ETag / Last-Modified) ответов GitHub API, хранящийся в PostgreSQL.
+
+    В начале запуска в память загружаются только валидаторы, сохраненный ответ читается из БД при получении 304.
+    Новые ответы и обращения к кэшу накапливаются и записываются одним запросом в flush(), там же
+    вытесняются давно не использованные записи сверх max_entries. """
+
+    def __init__(self, db: ParserPostgres, max_entries: int):
+        """
+        :param db: Подключение к БД.
+        :param max_entries: Максимальное кол-во записей в кэше (0 - кэш отключен).
+        """
+        self.db = db
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._validators = {}
+        self._pending = {}
+        self._hit_keys = set()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(url, params=None):
+        """ Ключ кэша: URL вместе с параметрами запроса.
+
+        :param url: URL запроса
+        :param params: Параметры запроса"""
+        return str(URL(str(url)).update_query(params or {}))
+
+    async def load(self):
+        """ Загружает валидаторы всех записей кэша. """
+        if self.enabled:
+            self._validators = await self.db.get_http_cache_validators()
+
+    def conditional_headers(self, key):
+        """ Заголовки условного запроса для ключа (пустой словарь, если ответ не закэширован).
+
+        :param key: Ключ кэша"""
+        etag, last_modified = self._validators.get(key, (None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    async def get(self, key):
+        """ Возвращает сохраненный ответ (payload, link) после ответа 304 или None, если запись вытеснена.
+
+        :param key: Ключ кэша"""
+        entry = await self.db.get_http_cache_entry(key)
+        if entry is None:
+            self._validators.pop(key, None)
+            return None
+        self.hits += 1
+        self._hit_keys.add(key)
+        return json.loads(entry['payload']), entry['link']
+
+    def store(self, key, etag, last_modified, payload, link):
+        """ Запоминает ответ для записи в БД при flush(). Ответы без валидаторов не кэшируются.
+
+        :param key: Ключ кэша
+        :param etag: Заголовок ETag ответа
+        :param last_modified: Заголовок Last-Modified ответа
+        :param payload: Тело ответа
+        :param link: Заголовок Link ответа"""
+        self.misses += 1
+        if not self.enabled or not (etag or last_modified):
+            return
+        self._validators[key] = (etag, last_modified)
+        self._pending[key] = (key, etag, last_modified, json.dumps(payload), link)
+
+    async def flush(self):
+        """ Записывает новые ответы, отмечает использованные записи и вытесняет лишние. """
+        if not self.enabled:
+            return
+        await self.db.save_http_cache(list(self._pending.values()), list(self._hit_keys), self.max_entries)
+        self._pending.clear()
+        self._hit_keys.clear()
+        logging.info(f"HTTP cache: {self.hits} hits, {self.misses} misses")
+
+    def stats(self):
+        """ Счетчики попаданий и промахов кэша. """
+        return {'hits': self.hits, 'misses': self.misses}
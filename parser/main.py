@@ -1,32 +1,133 @@
+import time
+
+# Время загрузки модуля - начало холодного старта функции
+_MODULE_STARTED = time.perf_counter()
+
 import asyncio
+import json
 import logging
 
-from db.postgres import ParserPostgres
-from parser import GithubParser
-from settings import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB
+from settings import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB, GITHUB_BACKEND, \
+    GITHUB_KEEPALIVE_SECONDS, PARSER_CONCURRENCY, PARSER_DEADLINE_MARGIN
 
 logging.basicConfig(level=logging.INFO)
 
+# Ресурсы, которые теплые вызовы функции переиспользуют: цикл событий (пул соединений с БД и HTTP сессия
+# привязаны к нему), пул соединений с БД, HTTP сессия к GitHub и время ее последнего использования.
+# Тяжелые модули (asyncpg, aiohttp, pydantic) импортируются при первом вызове.
+_loop = None
+_db = None
+_session = None
+_session_used_at = 0.0
+_invocations = 0
+
 
-async def main() -> None:
+async def _get_db():
+    """ Пул соединений с БД: прежний, если он отвечает, иначе новый. """
+    global _db
+    from db.postgres import ParserPostgres
+
+    if _db is not None:
+        if await _db.is_alive():
+            return _db
+        _db.terminate()
     db = ParserPostgres(db_host=POSTGRES_HOST, db_port=POSTGRES_PORT, db_name=POSTGRES_DB, db_user=POSTGRES_USER,
                         db_pass=POSTGRES_PASSWORD)
     await db.connect()
     logging.info("Connected to DB")
-    parser = GithubParser(db)
-    await parser.parse_and_save_data()
+    _db = db
+    return _db
+
+
+async def _get_session():
+    """ HTTP сессия к GitHub: прежняя, если ее соединения еще живы, иначе новая. """
+    global _session
+    import aiohttp
+    from parser import GithubParser
+
+    idle = time.monotonic() - _session_used_at
+    if _session is not None and not _session.closed and idle < GITHUB_KEEPALIVE_SECONDS:
+        return _session
+    if _session is not None:
+        await _session.close()
+    _session = aiohttp.ClientSession(connector=GithubParser.make_connector(PARSER_CONCURRENCY))
+    return _session
+
+
+def _parser_class():
+    if GITHUB_BACKEND == "graphql":
+        from graphql_parser import GraphQLGithubParser
+        return GraphQLGithubParser
+    from parser import GithubParser
+    return GithubParser
+
+
+async def main(deadline=None) -> dict:
+    """ Запуск парсера. Пул соединений с БД и HTTP сессия остаются открытыми для следующего вызова.
+
+    :param deadline: Момент (time.monotonic), к которому нужно прекратить запросы к GitHub (None - без ограничения)
+    :return: Сводка контрольной точки запуска и длительность подготовки (setup_seconds)"""
+    global _session_used_at
+    started = time.perf_counter()
+    parser_cls = _parser_class()
+    db = await _get_db()
+    session = await _get_session()
+    setup_seconds = time.perf_counter() - started
+
+    parser = parser_cls(db, session=session)
+    try:
+        progress = await parser.parse_and_save_data(deadline)
+    finally:
+        _session_used_at = time.monotonic()
     logging.info("Data successfully saved to DB")
-    await db.close()
-    logging.info("DB connection closed")
+    return {**progress, 'setup_seconds': round(setup_seconds, 4)}
+
+
+async def close():
+    """ Закрывает пул соединений с БД и HTTP сессию (при запуске не в облачной функции). """
+    global _db, _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+    if _db is not None:
+        await _db.close()
+        _db = None
+        logging.info("DB connection closed")
 
 
 def handler(event, context):
-    # Запуск асинхронной функции main и ожидание ее выполнения
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
-    # Возврат ответа об успешном выполнении
-    return {'statusCode': 200, 'body': 'Successfully parsed data'}
+    global _loop, _invocations
+    started = time.perf_counter()
+    # Холодный старт - первый вызов в экземпляре функции: создается цикл событий, открываются соединения
+    cold = _loop is None
+    if cold:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    _invocations += 1
+
+    # Срок вызова функции с запасом на запись собранных данных и контрольной точки
+    deadline = None
+    if hasattr(context, 'get_remaining_time_in_millis'):
+        deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - PARSER_DEADLINE_MARGIN
+    progress = _loop.run_until_complete(main(deadline))
+
+    logging.info(f"{'Cold' if cold else 'Warm'} start, invocation {_invocations}: "
+                 + (f"module load {_MODULE_LOADED_SECONDS:.3f}s, " if cold else "")
+                 + f"setup {progress['setup_seconds']:.3f}s, total {time.perf_counter() - started:.3f}s")
+    # Незавершенный запуск продолжается следующим вызовом с контрольной точки
+    message = 'Successfully parsed data' if progress['finished'] else 'Parser run paused, invoke again to resume'
+    return {'statusCode': 200, 'body': json.dumps({'message': message, 'start': 'cold' if cold else 'warm',
+                                                   **progress})}
+
+
+async def run_once():
+    try:
+        return await main()
+    finally:
+        await close()
+
 
+_MODULE_LOADED_SECONDS = time.perf_counter() - _MODULE_STARTED
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run_once())
@@ -0,0 +1,113 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# Границы корзин гистограмм длительности, сек.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """ Гистограмма длительностей с корзинами LATENCY_BUCKETS и процентилями по всем наблюдениям. """
+
+    def __init__(self):
+        self.values = []
+
+    def observe(self, value):
+        self.values.append(value)
+
+    def percentile(self, q):
+        """ Процентиль q (0..1) наблюдений или 0, если наблюдений нет. """
+        if not self.values:
+            return 0.0
+        values = sorted(self.values)
+        return values[min(len(values) - 1, max(0, int(len(values) * q + 0.5) - 1))]
+
+    def summary(self):
+        buckets = {str(bound): sum(1 for value in self.values if value <= bound) for bound in LATENCY_BUCKETS}
+        return {
+            'count': len(self.values),
+            'sum': round(sum(self.values), 4),
+            'p50': round(self.percentile(0.5), 4),
+            'p95': round(self.percentile(0.95), 4),
+            'max': round(max(self.values, default=0.0), 4),
+            'buckets': buckets,
+        }
+
+
+class RunMetrics:
+    """ Метрики одного запуска парсера: длительности этапов, гистограммы запросов к GitHub и обработки
+    репозиториев, остаток лимита запросов GitHub и счетчики. В конце запуска сохраняются сводкой в JSON. """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.phases = {}
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    @contextmanager
+    def phase(self, name):
+        """ Замеряет длительность этапа запуска (повторные замеры одного этапа суммируются). """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def observe(self, name, value):
+        """ Добавляет наблюдение в гистограмму name. """
+        self.histograms.setdefault(name, Histogram()).observe(value)
+
+    def inc(self, name, value=1):
+        """ Увеличивает счетчик name. """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """ Устанавливает значение показателя name. """
+        self.gauges[name] = value
+
+    def observe_github_response(self, kind, latency, response):
+        """ Учитывает ответ GitHub API: длительность запроса, статус и заголовки лимита запросов.
+
+        :param kind: Вид запроса (search, commits, graphql)
+        :param latency: Длительность запроса, сек.
+        :param response: aiohttp.ClientResponse"""
+        self.observe(f'github_request_seconds.{kind}', latency)
+        self.inc(f'github_requests.{kind}.{response.status}')
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is not None:
+            self.set('github_ratelimit_remaining', int(remaining))
+        if reset is not None:
+            self.set('github_ratelimit_reset', int(reset))
+
+    def summary(self, **extra):
+        """ Сводка запуска в виде словаря, пригодного для JSON. """
+        return {
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': round(time.perf_counter() - self._started, 4),
+            'phases_seconds': {name: round(value, 4) for name, value in self.phases.items()},
+            'histograms': {name: histogram.summary() for name, histogram in self.histograms.items()},
+            'counters': self.counters,
+            'gauges': self.gauges,
+            **extra,
+        }
+
+    def write_summary(self, path=None, **extra):
+        """ Записывает сводку запуска в лог одной JSON строкой и, если указан path, в файл.
+
+        :param path: Путь к файлу сводки
+        :param extra: Дополнительные поля сводки"""
+        summary = self.summary(**extra)
+        logging.info(f"Run summary: {json.dumps(summary)}")
+        if path:
+            try:
+                with open(path, 'w', encoding='utf-8') as file:
+                    json.dump(summary, file, indent=2)
+            except OSError as e:
+                logging.error(f"Failed to write run summary to {path}: {e}")
+        return summary
@@ -1,122 +1,403 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
+import time
+from contextlib import asynccontextmanager
 
 import aiohttp
-from dateutil import parser
 
+from aggregation import Watermark, add_commits_after, to_activities
+from checkpoint import RunCheckpoint, RepoProgress, DONE, FAILED
+from commits_decoder import read_commits
 from db.postgres import ParserPostgres
-from models import Repo, Activity
-from settings import GITHUB_TOP_REPOS_ENDPOINT, GITHUB_REPO_ACTIVITY_ENDPOINT, HEADERS
-
-import json
+from github_client import GithubClient, RateLimitError
+from http_cache import HttpCache, parse_link_header
+from metrics import RunMetrics
+from models import Repo
+from settings import GITHUB_SEARCH_ENDPOINT, GITHUB_REPO_ACTIVITY_ENDPOINT, GITHUB_TOKENS, GITHUB_MAX_RETRIES, \
+    GITHUB_RETRY_BACKOFF, GITHUB_RATELIMIT_MAX_WAIT, GITHUB_KEEPALIVE_SECONDS, TOP_REPOS_COUNT, SEARCH_CONCURRENCY, \
+    PARSER_CONCURRENCY, COMMITS_PER_PAGE, COMMITS_MAX_PAGES, COMMITS_MAX_SECONDS, COMMITS_PREFETCH_PAGES, \
+    HTTP_CACHE_MAX_ENTRIES, RUN_SUMMARY_PATH, PARSER_RESUME_MAX_AGE_HOURS
+from top_search import StarRangeSearch
 
 
 class GithubParser:
-    def __init__(self, db: ParserPostgres):
+    def __init__(self, db: ParserPostgres, concurrency: int = PARSER_CONCURRENCY, cache: HttpCache = None,
+                 tokens: list[str] = None, top_count: int = TOP_REPOS_COUNT,
+                 session: aiohttp.ClientSession = None):
+        """
+        :param db: Подключение к БД.
+        :param concurrency: Максимальное кол-во одновременно обрабатываемых репозиториев (1 - последовательно).
+        :param cache: Кэш условных запросов к GitHub API (по умолчанию - в БД, HTTP_CACHE_MAX_ENTRIES записей).
+        :param tokens: Токены GitHub (по умолчанию - GITHUB_TOKENS).
+        :param top_count: Кол-во отслеживаемых репозиториев топа.
+        :param session: HTTP сессия для запросов к GitHub, переиспользуемая между запусками (не закрывается).
+            По умолчанию каждый запуск создает свою сессию.
+        """
         self.db = db
+        self.concurrency = max(1, concurrency)
+        self.top_count = top_count
+        self.session = session
+        self.tokens = GITHUB_TOKENS if tokens is None else tokens
+        self.cache = cache or HttpCache(db, HTTP_CACHE_MAX_ENTRIES)
+        self.metrics = RunMetrics()
+        self.checkpoint = None
+        self.deadline = None
+
+    async def parse_and_save_data(self, deadline=None):
+        """ Точка входа, запуска парсинга. Продолжает незавершенный запуск с его контрольной точки, если он есть.
+        В конце запуска (в т.ч. неудачного) сохраняет сводку метрик.
+
+        :param deadline: Момент (time.monotonic), после которого новые страницы истории не запрашиваются
+            (None - без ограничения). Необработанные репозитории остаются в контрольной точке до следующего вызова.
+        :return: Сводка контрольной точки: сколько репозиториев обработано и завершен ли запуск"""
+        self.metrics = RunMetrics()
+        self.checkpoint = None
+        self.deadline = deadline
+        started = time.perf_counter()
+        repos, pending, failed, error = [], [], [], None
+        try:
+            with self.metrics.phase('cache_load'):
+                await self.cache.load()
+            with self.metrics.phase('checkpoint_load'):
+                run = await self.db.get_unfinished_run(PARSER_RESUME_MAX_AGE_HOURS)
+            async with self._github_session() as session:
+                client = GithubClient(session, self.tokens, self.metrics, GITHUB_MAX_RETRIES, GITHUB_RETRY_BACKOFF,
+                                      GITHUB_RATELIMIT_MAX_WAIT, deadline)
+                if run is not None:
+                    # Снимок топа продолжаемого запуска уже записан первым вызовом
+                    self.checkpoint = RunCheckpoint.from_db(*run)
+                    logging.info(f"Resuming parser run {self.checkpoint.run_id} "
+                                 f"started at {self.checkpoint.started_at.isoformat()}")
+                else:
+                    with self.metrics.phase('search'):
+                        repos = await self._get_top_repos(client)
+                    self.checkpoint = RunCheckpoint.new(repos)
+                pending = self.checkpoint.pending_repos()
+                with self.metrics.phase('commits'):
+                    activities, latencies, failed = await self._process_repos(client, pending)
+            for latency in latencies:
+                self.metrics.observe('repo_fetch_seconds', latency)
+
+            # Снимок топа, собранная активность и контрольная точка записываются в БД одной транзакцией
+            with self.metrics.phase('db_write'):
+                await self.db.ensure_activity_partitions(activities)
+                await self.db.save_snapshot([repo.dict() for repo in repos], activities, self.checkpoint,
+                                            self._collect_watermarks(activities))
+            with self.metrics.phase('cache_flush'):
+                await self.cache.flush()
+
+            fetch = self.metrics.histograms.get('repo_fetch_seconds')
+            logging.info(f"Parsed {len(activities)} of {len(pending)} repos in {time.perf_counter() - started:.2f}s "
+                         f"(concurrency={self.concurrency}, failed={len(failed)}, "
+                         f"repo latency p95={fetch.percentile(0.95) if fetch else 0.0:.2f}s)")
+            if failed:
+                logging.warning(f"Failed repos: {', '.join(failed)}")
+            progress = self.checkpoint.summary()
+            if not progress['finished']:
+                logging.info(f"Parser run {progress['run_id']} paused with {progress['pending']} repos pending")
+            return progress
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            self.metrics.write_summary(RUN_SUMMARY_PATH, backend=type(self).__name__, concurrency=self.concurrency,
+                                       tokens=len(self.tokens), repos=len(pending), failed=failed, error=error,
+                                       http_cache=self.cache.stats(),
+                                       checkpoint=self.checkpoint.summary() if self.checkpoint else None)
+
+    @asynccontextmanager
+    async def _github_session(self):
+        """ HTTP сессия запуска: переданная в конструктор или новая, закрываемая в конце запуска. """
+        if self.session is not None:
+            yield self.session
+            return
+        async with aiohttp.ClientSession(connector=self.make_connector(self.concurrency)) as session:
+            yield session
+
+    @staticmethod
+    def make_connector(concurrency):
+        """ Пул соединений к GitHub, размер ограничен числом воркеров. """
+        return aiohttp.TCPConnector(limit=max(1, concurrency), keepalive_timeout=GITHUB_KEEPALIVE_SECONDS)
+
+    def _deadline_passed(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _repo_deadline(self):
+        """ Момент, после которого история одного репозитория больше не запрашивается: COMMITS_MAX_SECONDS
+        от начала обработки, но не позже срока вызова. """
+        deadline = time.monotonic() + COMMITS_MAX_SECONDS
+        return deadline if self.deadline is None else min(deadline, self.deadline)
+
+    async def _get_top_repos(self, client: GithubClient):
+        """ Запрашивает данные топ self.top_count репозиториев из GitHub (см. StarRangeSearch) """
+        async def fetch(query, page, per_page):
+            return await self._search_repos(client, query, page, per_page)
+
+        search = StarRangeSearch(fetch, SEARCH_CONCURRENCY)
+        items = await search.top(self.top_count)
+        self.metrics.set('search_shards', search.shards)
+        return [self._build_repo(i + 1, repo_data) for i, repo_data in enumerate(items)]
+
+    async def _search_repos(self, client: GithubClient, query, page, per_page):
+        """ Запрашивает страницу поиска репозиториев по убыванию звезд.
+
+        :param client: GithubClient
+        :param query: Условие поиска (например, stars:1000..2000)
+        :param page: Номер страницы
+        :param per_page: Размер страницы
+        :return: (кол-во найденных репозиториев, репозитории страницы)"""
+        params = {'q': query, 'sort': 'stars', 'order': 'desc', 'per_page': per_page, 'page': page}
+        data, _ = await self._get_json(client, GITHUB_SEARCH_ENDPOINT, params, project=self._project_search,
+                                       kind='search')
+        return data['total_count'], data['items']
+
+    async def _get_json(self, client: GithubClient, url, params=None, project=None, kind='rest', decode=None,
+                        cached=True):
+        """ Выполняет GET запрос к GitHub API с условными заголовками из кэша.
+        На ответ 304 (не расходует лимит запросов) возвращает сохраненный ответ.
+
+        :param client: GithubClient
+        :param url: URL запроса
+        :param params: Параметры запроса
+        :param project: Функция, оставляющая в ответе только нужные поля (перед сохранением в кэш)
+        :param kind: Вид запроса для метрик
+        :param decode: Асинхронная функция разбора тела ответа вместо response.json() (например, потоковая)
+        :param cached: Использовать кэш условных запросов (False - для запросов, URL которых не повторяется)
+        :return: (тело ответа, ссылки из заголовка Link)"""
+        key = self.cache.make_key(url, params)
+        headers = self.cache.conditional_headers(key) if cached else None
+        async with client.request('GET', url, kind, headers=headers, params=params) as response:
+            if response.status != 304:
+                response.raise_for_status()
+                payload = await (decode(response) if decode is not None else response.json())
+                if project is not None:
+                    payload = project(payload)
+                link = response.headers.get('Link')
+                if cached:
+                    self.cache.store(key, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                     payload, link)
+                return payload, parse_link_header(link)
+
+        # 304 приходит только на условный запрос, то есть для кэшируемого URL
+        entry = await self.cache.get(key)
+        if entry is None:
+            # Запись вытеснена из кэша после загрузки валидаторов - повторяет запрос без них
+            return await self._get_json(client, url, params, project, kind, decode, cached=True)
+        payload, link = entry
+        return payload, parse_link_header(link)
+
+    async def _process_repos(self, client: GithubClient, repos: list[Repo]):
+        """ Собирает активность репозиториев, не более self.concurrency одновременно
+
+        :param client: GithubClient
+        :param repos: Репозитории топа
+        :return: Активность завершенных репозиториев {repo: [activity]}, время обработки каждого репозитория
+            и список репозиториев, обработка которых завершилась ошибкой"""
+        await self._fix_watermarks(repos)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = await asyncio.gather(*(
+            self._process_repo(client, semaphore, repo, self.checkpoint.progress[repo.repo]) for repo in repos
+        ))
+        activities, failed = self._collect_results(repos)
+        return activities, [latency for latency in latencies if latency is not None], failed
+
+    async def _fix_watermarks(self, repos):
+        """ Фиксирует в контрольной точке отметку истории (since) репозиториев, история которых в запуске еще
+        не запрашивалась: отметка из repo_commit_watermarks или пустая, если история еще не загружалась.
+
+        :param repos: Репозитории топа"""
+        new = [repo.repo for repo in repos if not self.checkpoint.progress[repo.repo].started]
+        if not new:
+            return
+        # Отметки всех репозиториев запрашиваются одним запросом
+        with self.metrics.phase('db_read'):
+            watermarks = await self.db.get_commit_watermarks(new)
+        for name in new:
+            self.checkpoint.progress[name].since = Watermark(*watermarks.get(name, (None, ())))
 
-    async def parse_and_save_data(self):
-        """ Точка входа, запуска парсинга """
-        async with aiohttp.ClientSession() as session:
-            top_repos = await self._get_top_repos(session)
-            await self._process_repos(session, top_repos)
-
-    async def _get_top_repos(self, session: aiohttp.ClientSession):
-        """ Запрашивает данные топ 100 репозиториев из GitHub """
-        async with session.get(GITHUB_TOP_REPOS_ENDPOINT, headers=HEADERS) as response:
-            response.raise_for_status()
-            data = await response.json()
-            return data['items']
-
-    async def _process_repos(self, session: aiohttp.ClientSession, repos):
-        """ Обрабатывает данные репозиториев
-        :param session: aiohttp.ClientSession
-        :param repos: Данные репозиториев"""
-        for i, repo_data in enumerate(repos):
-            repo = Repo(
-                repo=repo_data['full_name'],
-                owner=repo_data['owner']['login'],
-                position_cur=i+1,
-                position_prev=None,
-                stars=repo_data['stargazers_count'],
-                watchers=repo_data['watchers'],
-                forks=repo_data['forks'],
-                open_issues=repo_data['open_issues'],
-                language=repo_data['language'] or None
-            )
-
-            await self._update_or_insert_repo(repo)
-            await self._process_repo_activity(session, repo)
-
-    async def _update_or_insert_repo(self, repo: Repo):
-        """ Проверяет наличие репозитория в БД и вставляет / обновляет данные
-
-        :param repo: Данные репозитория"""
-        existing_repo = await self.db.get_repo_id_by_name_and_owner(repo.repo)
-        if existing_repo:
-            await self.db.update_repo(existing_repo[0]['id'], repo.dict())
+    def _collect_watermarks(self, activities):
+        """ Новые отметки истории репозиториев, завершенных в этом вызове.
+
+        :param activities: Активность завершенных репозиториев {repo: [activity]}
+        :return: Словарь {repo: (дата коммитера, [sha])}"""
+        progress = self.checkpoint.progress
+        return {repo: (progress[repo].newest.as_datetime(), sorted(progress[repo].newest.shas))
+                for repo in activities if progress[repo].newest}
+
+    def _collect_results(self, repos):
+        """ Активность репозиториев, завершенных в этом вызове, и список репозиториев с ошибкой.
+
+        :param repos: Репозитории, обрабатывавшиеся в этом вызове
+        :return: ({repo: [activity]}, [repo])"""
+        progress = self.checkpoint.progress
+        activities = {repo.repo: to_activities(progress[repo.repo].commits_by_date) for repo in repos
+                      if progress[repo.repo].status == DONE}
+        failed = [repo.repo for repo in repos if progress[repo.repo].status == FAILED]
+        return activities, failed
+
+    @staticmethod
+    def _build_repo(position, repo_data) -> Repo:
+        """ Собирает модель репозитория из ответа GitHub
+
+        :param position: Позиция в топе (начиная с 1)
+        :param repo_data: Данные репозитория из GitHub"""
+        return Repo(
+            repo=repo_data['full_name'],
+            owner=repo_data['owner']['login'],
+            position_cur=position,
+            position_prev=None,
+            stars=repo_data['stargazers_count'],
+            watchers=repo_data['watchers'],
+            forks=repo_data['forks'],
+            open_issues=repo_data['open_issues'],
+            language=repo_data['language'] or None
+        )
+
+    async def _process_repo(self, client: GithubClient, semaphore: asyncio.Semaphore, repo: Repo,
+                            progress: RepoProgress):
+        """ Собирает активность одного репозитория. Ошибка не прерывает обработку остальных репозиториев.
+
+        :param client: GithubClient
+        :param semaphore: Ограничитель кол-ва одновременно обрабатываемых репозиториев
+        :param repo: Данные репозитория
+        :param progress: Состояние репозитория в контрольной точке, обновляется по мере загрузки истории
+        :return: Время обработки в секундах или None, если срок вызова истек до начала обработки"""
+        async with semaphore:
+            if self._deadline_passed():
+                # Репозиторий остается в контрольной точке и обрабатывается следующим вызовом
+                return None
+            started = time.perf_counter()
+            try:
+                await self._get_repo_commits(client, repo, progress)
+            except RateLimitError as e:
+                # Загруженные страницы учтены в контрольной точке, репозиторий продолжается следующим вызовом
+                logging.warning(f"Repo {repo.repo} postponed: {e}")
+            except Exception as e:
+                logging.error(f"Failed to process repo {repo.repo}: {e}")
+                progress.status = FAILED
+            latency = time.perf_counter() - started
+            logging.info(f"Processed repo {repo.repo} in {latency:.2f}s")
+            return latency
+
+    async def _get_repo_commits(self, client, repo: Repo, progress: RepoProgress):
+        """ Запрашивает страницы коммитов репозитория и агрегирует их по дням в progress.commits_by_date.
+
+        Каждая страница сворачивается в агрегацию сразу по получении, коммиты до отметки progress.since
+        пропускаются, новейший коммит сдвигает progress.newest. Кол-во страниц и время ограничены
+        COMMITS_MAX_PAGES и COMMITS_MAX_SECONDS, при их превышении история обрезается. При истечении
+        срока вызова или исчерпании лимита запросов загрузка приостанавливается: номер следующей страницы
+        всегда соответствует загруженным страницам и хранится в progress.cursor, следующий вызов продолжает с него.
+
+        :param client: GithubClient
+        :param repo: Данные репозитория
+        :param progress: Состояние репозитория: отметка since (пустая - вся история), курсор, агрегация загруженных
+            страниц и новейший загруженный коммит"""
+        # История запрашивается до начала запуска, поэтому страницы не сдвигаются между вызовами запуска
+        params = {'per_page': COMMITS_PER_PAGE, 'until': self.checkpoint.until.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        # Пустая отметка - вся история, иначе - коммиты начиная с отметки (уже учтенные отбрасываются)
+        if progress.since:
+            params['since'] = progress.since.committed_at
+        url = f"{GITHUB_REPO_ACTIVITY_ENDPOINT}/{repo.repo}/commits"
+        deadline = self._repo_deadline()
+
+        # Первая страница вызова (первая страница истории или курсор приостановленной загрузки):
+        # по заголовку Link определяется, известно ли общее кол-во страниц
+        page = int(progress.cursor or 1)
+        commits, links = await self._get_commits_page(client, url, {**params, 'page': page} if page > 1 else params)
+        add_commits_after(progress.commits_by_date, commits, progress.since, progress.newest)
+        progress.pages += 1
+        progress.cursor = str(page + 1)
+
+        last_url = links.get('last', {}).get('url')
+        if last_url is not None:
+            # Общее кол-во страниц известно - запрашивает оставшиеся страницы параллельно
+            last_page = int(last_url.query.get('page', 1))
+            stop_page = min(last_page, page + COMMITS_MAX_PAGES - progress.pages)
+            await self._prefetch_commits_pages(client, url, params, range(page + 1, stop_page + 1), progress,
+                                               deadline)
+            has_more = int(progress.cursor) <= last_page
         else:
-            await self.db.insert_repo(repo.dict())
-
-    async def _process_repo_activity(self, session: aiohttp.ClientSession, repo: Repo):
-        """ Обрабатывает данные активности репозитория
-
-        :param session: aiohttp.ClientSession
-        :param repo: данные репозитория """
-        # Получает ID репозитория из БД
-        repo_data = await self.db.get_repo_id_by_name_and_owner(repo.repo)
-        repo_id = repo_data[0]['id']
-
-        # Получает дату последней активности в этом репозитории
-        last_activity_date = await self.db.get_last_activity_date(repo_id)
-        # Устанавливает значение since (дата последней активности + 1 день) если дата есть, иначе None
-        since = last_activity_date + timedelta(days=1) if last_activity_date else None
-        # Получает активность репозитория
-        activities = await self._get_repo_commits(session, repo, since)
-        await self._save_repo_activity(repo_id, activities)
-
-    async def _get_last_activity_date(self, repo_id):
-        """ Получает дату последней активности репозитория из БД
-
-        :param repo_id: ID репозитория """
-        result = await self.db.get_last_activity_date(repo_id)
-        return result
-
-    async def _get_repo_commits(self, session, repo: Repo, since=None):
-        # Если since = None - оставляет параметр пустым, иначе - дата (дата последней активности + 1 день)
-        params = {'since': since.isoformat()} if since else {}
-
-        # Запрашивает через GitHub API активность репозитория, передавая параметр since (если установлен)
-        async with session.get(f"{GITHUB_REPO_ACTIVITY_ENDPOINT}/{repo.repo}/commits", params=params, headers=HEADERS) as response:
-            response.raise_for_status()
-            commits = await response.json()
-
-            # Словарь для хранения данных о коммитах
-            commits_by_date = {}
-            # Итерирует по каждому коммиту из полученного ответа
-            for commit in commits:
-                # Парсит дату коммита и преобразует ее в объект date
-                commit_date = parser.parse(commit['commit']['author']['date']).date()
-                # Если даты коммита еще нет в словаре - инициализирует запись
-                if commit_date not in commits_by_date:
-                    commits_by_date[commit_date] = {
-                        'date': commit_date,    # Дата коммита
-                        'commits': 0,           # Счетчик кол-ва коммитов
-                        'authors': set(),       # Множество авторов
-                    }
-                # Увеличивает счетчик коммитов для каждой даты
-                commits_by_date[commit_date]['commits'] += 1
-                # Добавляет автора во множество авторов
-                commits_by_date[commit_date]['authors'].add(commit["commit"]['author']['name'])
-
-            # Возвращает список значений словаря, содержащий информацию о коммитах по дням
-            return list(commits_by_date.values())
-
-    async def _save_repo_activity(self, repo_id, activities):
-        """ Сохрвняет активность репозитория в БД.
-
-         :param repo_id: ID репозитория в БД.
-         :param activities: models.Activities Данные активности репозитория """
-        for activity in activities:
-            await self.db.insert_repo_activity(repo_id, activity)
\ No newline at end of file
+            # Иначе идет по ссылкам rel="next" последовательно
+            last_page = None
+            next_url = links.get('next', {}).get('url')
+            while next_url is not None and progress.pages < COMMITS_MAX_PAGES and time.monotonic() < deadline:
+                commits, links = await self._get_commits_page(client, next_url)
+                add_commits_after(progress.commits_by_date, commits, progress.since, progress.newest)
+                progress.pages += 1
+                progress.cursor = str(int(progress.cursor) + 1)
+                next_url = links.get('next', {}).get('url')
+            has_more = next_url is not None
+
+        if has_more and self._deadline_passed():
+            logging.info(f"Commit history of {repo.repo} paused at page {progress.cursor}")
+            return
+        if has_more:
+            logging.warning(f"Commit history of {repo.repo} truncated: fetched {progress.pages} of "
+                            f"{last_page or f'{progress.pages + 1}+'} pages")
+        progress.status = DONE
+        progress.cursor = None
+
+    async def _prefetch_commits_pages(self, client, url, params, page_numbers, progress: RepoProgress, deadline):
+        """ Параллельно запрашивает страницы коммитов (не более COMMITS_PREFETCH_PAGES одновременно)
+        и сворачивает их в progress.commits_by_date по порядку номеров: страница, полученная раньше предыдущих,
+        ждет их в памяти. После каждой учтенной страницы progress.cursor указывает на следующую, поэтому
+        после остановки по времени или ошибки учтены ровно страницы до курсора.
+
+        :param client: GithubClient
+        :param url: URL списка коммитов
+        :param params: Параметры запроса (без номера страницы)
+        :param page_numbers: Номера запрашиваемых страниц (range)
+        :param progress: Состояние репозитория
+        :param deadline: Момент (time.monotonic), после которого оставшиеся страницы не запрашиваются"""
+        semaphore = asyncio.Semaphore(COMMITS_PREFETCH_PAGES)
+
+        async def fetch(page):
+            async with semaphore:
+                commits, _ = await self._get_commits_page(client, url, {**params, 'page': page})
+                return page, commits
+
+        next_page = page_numbers.start
+        tasks = [asyncio.create_task(fetch(page)) for page in page_numbers]
+        if not tasks:
+            return
+        received = {}
+        try:
+            for task in asyncio.as_completed(tasks, timeout=max(deadline - time.monotonic(), 0)):
+                page, commits = await task
+                received[page] = commits
+                while next_page in received:
+                    add_commits_after(progress.commits_by_date, received.pop(next_page), progress.since,
+                                      progress.newest)
+                    progress.pages += 1
+                    next_page += 1
+                    progress.cursor = str(next_page)
+        except asyncio.TimeoutError:
+            logging.warning(f"Commits prefetch of {url} stopped at page {next_page}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get_commits_page(self, client, url, params=None):
+        """ Запрашивает одну страницу коммитов.
+
+        :param client: GithubClient
+        :param url: URL страницы
+        :param params: Параметры запроса
+        :return: (список коммитов, ссылки из заголовка Link)"""
+        # Тело страницы разбирается по мере получения, от коммитов остаются только нужные поля.
+        # URL страниц содержит until (начало запуска) и since (отметку истории) и не повторяется между запусками,
+        # поэтому страницы не кэшируются: иначе они вытесняли бы из кэша повторяющиеся запросы поиска
+        return await self._get_json(client, url, params, kind='commits', decode=read_commits, cached=False)
+
+    @staticmethod
+    def _project_search(data):
+        """ Оставляет в ответе поиска только кол-во найденных и поля репозиториев, нужные _build_repo.
+
+        :param data: Ответ поиска GitHub"""
+        fields = ('full_name', 'stargazers_count', 'watchers', 'forks', 'open_issues', 'language')
+        return {
+            'total_count': data['total_count'],
+            'items': [{**{field: item[field] for field in fields}, 'owner': {'login': item['owner']['login']}}
+                      for item in data['items']],
+        }
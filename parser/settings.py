@@ -3,17 +3,64 @@ import os
 # GITHUB
 
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
+# Пул токенов через запятую: запросы распределяются между ними по остатку лимита (GITHUB_TOKEN добавляется в пул)
+GITHUB_TOKENS = list(dict.fromkeys(
+    token.strip() for token in [*os.getenv("GITHUB_TOKENS", "").split(","), GITHUB_TOKEN or ""] if token.strip()
+))
 
-GITHUB_TOP_REPOS_ENDPOINT = "https://api.github.com/search/repositories?q=stars:%3E1&sort=stars&per_page=100"
-GITHUB_REPO_ACTIVITY_ENDPOINT = "https://api.github.com/repos"
+# Адрес GitHub API (переопределяется для запуска против локальной замены, см. benchmarks/fake_github.py)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
 
-HEADERS = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-}
+GITHUB_SEARCH_ENDPOINT = f"{GITHUB_API_URL}/search/repositories"
+GITHUB_REPO_ACTIVITY_ENDPOINT = f"{GITHUB_API_URL}/repos"
+GITHUB_GRAPHQL_ENDPOINT = os.getenv("GITHUB_GRAPHQL_ENDPOINT", f"{GITHUB_API_URL}/graphql")
+
+# Способ получения данных из GitHub: "rest" или "graphql"
+GITHUB_BACKEND = os.getenv("GITHUB_BACKEND", "rest")
+# Кол-во репозиториев в одном пакетном GraphQL запросе истории коммитов
+GRAPHQL_BATCH_SIZE = int(os.getenv("GRAPHQL_BATCH_SIZE", 25))
+
+# Повторы запросов к GitHub: максимальное кол-во повторов, начальная задержка после ошибки 5xx (удваивается),
+# максимальное ожидание восстановления лимита запросов (дольше - запрос откладывается до следующего вызова), сек.
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", 5))
+GITHUB_RETRY_BACKOFF = float(os.getenv("GITHUB_RETRY_BACKOFF", 1))
+GITHUB_RATELIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATELIMIT_MAX_WAIT", 60))
+# Время жизни неиспользуемого соединения с GitHub, сек. Теплый вызов функции после более долгого простоя
+# создает новую HTTP сессию: соединения прежней уже закрыты сервером
+GITHUB_KEEPALIVE_SECONDS = float(os.getenv("GITHUB_KEEPALIVE_SECONDS", 15))
+
+# PARSER
+# Кол-во отслеживаемых репозиториев топа (больше 1000 - поиск делится на шарды по диапазонам звезд)
+TOP_REPOS_COUNT = int(os.getenv("TOP_REPOS_COUNT", 100))
+# Кол-во одновременных запросов поиска при сборе топа
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", 4))
+# Кол-во репозиториев, обрабатываемых одновременно (1 - последовательная обработка)
+PARSER_CONCURRENCY = int(os.getenv("PARSER_CONCURRENCY", 10))
+# Пагинация коммитов: размер страницы, ограничения на кол-во страниц и время на один репозиторий,
+# кол-во страниц, запрашиваемых одновременно
+COMMITS_PER_PAGE = 100
+COMMITS_MAX_PAGES = int(os.getenv("COMMITS_MAX_PAGES", 50))
+COMMITS_MAX_SECONDS = float(os.getenv("COMMITS_MAX_SECONDS", 60))
+COMMITS_PREFETCH_PAGES = int(os.getenv("COMMITS_PREFETCH_PAGES", 4))
+# Загрузка всей истории репозитория (backfill.py): длительность окна истории в днях (окна запрашиваются
+# параллельно) и кол-во одновременно запрашиваемых окон всех репозиториев
+BACKFILL_WINDOW_DAYS = int(os.getenv("BACKFILL_WINDOW_DAYS", 90))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", 8))
+# Максимальное кол-во ответов GitHub API в кэше условных запросов (ETag / Last-Modified), 0 - кэш отключен
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", 5000))
+# Файл, в который в конце запуска записывается JSON сводка метрик (сводка также пишется в лог)
+RUN_SUMMARY_PATH = os.getenv("RUN_SUMMARY_PATH")
+# Запас времени до срока вызова функции на запись результатов и контрольной точки, сек.
+PARSER_DEADLINE_MARGIN = float(os.getenv("PARSER_DEADLINE_MARGIN", 30))
+# Незавершенный запуск продолжается следующим вызовом, если начат не раньше, чем столько часов назад
+PARSER_RESUME_MAX_AGE_HOURS = int(os.getenv("PARSER_RESUME_MAX_AGE_HOURS", 12))
 
 # POSTGRES
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
-POSTGRES_DB = os.getenv("POSTGRES_DB")
\ No newline at end of file
+POSTGRES_DB = os.getenv("POSTGRES_DB")
+
+# Канал PostgreSQL NOTIFY, в который парсер сообщает о записи нового снимка топа
+TOP_REPOS_SNAPSHOT_CHANNEL = "top_repos_snapshot"
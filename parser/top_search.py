@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import math
+
+
+# Поиск GitHub возвращает не больше 1000 результатов на запрос, не больше 100 на страницу
+SEARCH_MAX_RESULTS = 1000
+SEARCH_PER_PAGE = 100
+
+
+class StarRangeSearch:
+    """ Сбор топ-N репозиториев по звездам поиском GitHub.
+
+    Топ до SEARCH_MAX_RESULTS собирается страницами одного запроса по убыванию звезд. Больший топ не помещается
+    в один запрос, поэтому диапазон звезд делится на непересекающиеся шарды stars:a..b, каждый не больше
+    SEARCH_MAX_RESULTS репозиториев, шарды и их страницы запрашиваются параллельно и сливаются в общий рейтинг.
+
+    Границы шардов строятся по кол-ву репозиториев stars:>=X, которое ищется при поиске нижней границы топа.
+    Последний шард без верхней границы (stars:>=a): в него попадает и репозиторий, набравший звезды за время сбора.
+    Шард, в котором к моменту запроса оказалось больше SEARCH_MAX_RESULTS репозиториев, делится пополам
+    (по среднему геометрическому границ - звезды распределены по степенному закону). """
+
+    def __init__(self, fetch, concurrency: int):
+        """
+        :param fetch: Корутина fetch(query, page, per_page) -> (total_count, items) - страница поиска
+            репозиториев по убыванию звезд
+        :param concurrency: Максимальное кол-во одновременных запросов поиска
+        """
+        self.fetch = fetch
+        self.concurrency = max(1, concurrency)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.requests = 0
+        self.shards = 0
+
+    async def _fetch(self, query, page=1, per_page=SEARCH_PER_PAGE):
+        async with self.semaphore:
+            self.requests += 1
+            return await self.fetch(query, page, per_page)
+
+    async def top(self, count: int) -> list[dict]:
+        """ Репозитории топа по убыванию звезд (при равенстве - по названию), не больше count. """
+        if count <= SEARCH_MAX_RESULTS:
+            items = await self._pages("stars:>1", 1, math.ceil(count / SEARCH_PER_PAGE))
+        else:
+            items = await self._sharded(count)
+        return self.merge(items, count)
+
+    @staticmethod
+    def merge(items, count):
+        """ Общий рейтинг из результатов шардов. Репозиторий, звезды которого изменились между запросами шардов,
+        может попасть в два шарда - остается запись с большим кол-вом звезд. """
+        unique = {}
+        for item in items:
+            seen = unique.get(item['full_name'])
+            if seen is None or item['stargazers_count'] > seen['stargazers_count']:
+                unique[item['full_name']] = item
+        return sorted(unique.values(), key=lambda item: (-item['stargazers_count'], item['full_name']))[:count]
+
+    async def _pages(self, query, first_page, last_page):
+        """ Страницы first_page..last_page запроса, параллельно. """
+        results = await asyncio.gather(*(self._fetch(query, page) for page in range(first_page, last_page + 1)))
+        return [item for _, items in results for item in items]
+
+    async def _sharded(self, count):
+        """ Топ больше SEARCH_MAX_RESULTS: нижняя граница звезд топа, шарды выше нее, запрос шардов. """
+        total, items = await self._fetch("stars:>=1", per_page=1)
+        if not items:
+            return []
+        top_stars = items[0]['stargazers_count']
+        # Кол-во репозиториев с не меньшим числом звезд: {stars: count(stars:>=stars)}
+        counts = {1: total, top_stars + 1: 0}
+        low = await self._find_lower_bound(count, counts)
+
+        shards = self._plan_shards(low, counts)
+        self.shards = 0
+        results = await asyncio.gather(*(self._shard(a, b) for a, b in shards))
+        logging.info(f"Top {count} repos: stars >= {low}, {self.shards} search shards, {self.requests} requests")
+        return [item for shard_items in results for item in shard_items]
+
+    async def _find_lower_bound(self, count, counts):
+        """ Ищет кол-во звезд low, при котором count(stars:>=low) не меньше count, но превышает его не больше чем
+        на 10% (лишние репозитории запрашиваются и отбрасываются). Каждый раунд параллельно проверяет
+        по одной точке на каждый одновременный запрос между текущими границами, в геометрической прогрессии.
+
+        :param counts: Известные кол-ва count(stars:>=X), дополняется проверенными точками"""
+        slack = max(SEARCH_PER_PAGE, count // 10)
+        low, high = 1, max(counts)
+        while high - low > 1 and counts[low] > count + slack:
+            points = sorted({
+                min(max(round(low * (high / low) ** (i / (self.concurrency + 1))), low + 1), high - 1)
+                for i in range(1, self.concurrency + 1)
+            })
+            totals = await asyncio.gather(*(self._fetch(f"stars:>={point}", per_page=1) for point in points))
+            for point, (total, _) in zip(points, totals):
+                counts[point] = total
+            low = max(point for point, total in counts.items() if total >= count)
+            high = min(point for point, total in counts.items() if total < count and point > low)
+        return low
+
+    @staticmethod
+    def _plan_shards(low, counts):
+        """ Делит диапазон звезд от low на шарды по известным точкам: соседние интервалы объединяются,
+        пока в шарде не больше SEARCH_MAX_RESULTS репозиториев.
+
+        :return: Список (a, b) - шарды stars:a..b, у последнего шарда b = None (stars:>=a)"""
+        points = sorted(point for point in counts if point >= low)
+        shards, start = [], points[0]
+        for i in range(1, len(points)):
+            if counts[start] - counts[points[i]] > SEARCH_MAX_RESULTS and points[i - 1] > start:
+                shards.append((start, points[i - 1] - 1))
+                start = points[i - 1]
+        shards.append((start, None))
+        return shards
+
+    async def _shard(self, a, b):
+        """ Все репозитории шарда stars:a..b (b = None - stars:>=a). Переполненный шард делится пополам. """
+        query = f"stars:{a}..{b}" if b is not None else f"stars:>={a}"
+        total, items = await self._fetch(query)
+        # Верхняя граница шарда без нее - звезды первого (самого звездного) репозитория ответа
+        top = b if b is not None else max((item['stargazers_count'] for item in items[:1]), default=a)
+        if total > SEARCH_MAX_RESULTS and a < top:
+            middle = min(max(math.isqrt(a * top), a), top - 1)
+            halves = await asyncio.gather(self._shard(a, middle), self._shard(middle + 1, b))
+            return halves[0] + halves[1]
+        self.shards += 1
+        if total > SEARCH_MAX_RESULTS:
+            logging.warning(f"Search shard {query} has {total} repos, only first {SEARCH_MAX_RESULTS} are available")
+        last_page = math.ceil(min(total, SEARCH_MAX_RESULTS) / SEARCH_PER_PAGE)
+        return items + await self._pages(query, 2, last_page)